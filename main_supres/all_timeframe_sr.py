@@ -1,149 +1,73 @@
-import csv
 import datetime
-import os
 import time
-import pandas as pd
-from binance.client import Client
+import numpy as np
+import fetch_scheduler
 import frameselect
+import market_data
+import pivots
+import resample
+from candle_store import CandleStore
+
+candle_count = 254  # Number of candles every timeframe is analyzed with
+max_base_candles = 1000  # Largest download per base interval, one klines request
+
+
+def base_count(base) -> int:
+    """
+    Number of base candles needed to build every timeframe of the plan, one more bucket than needed, the
+    oldest one may only be partly covered
+    """
+    longest = max(frameselect.interval_ms[interval] for interval in plan[base])
+    return (candle_count + 1) * longest // frameselect.interval_ms[base]
+
+
+def hist_jobs(ticker) -> list:
+    """
+    One download per base interval of the plan, starting after the last candle in the local candle store
+    """
+    return [fetch_scheduler.FetchJob(ticker, store.top_up_plan(ticker, base, base_count(base))) for base in plan]
+
+
+def hist_data(ticker) -> dict:
+    """
+    Builds every timeframe out of its base candles in the local candle store
+    :return: Kline interval -> candles, oldest first
+    """
+    frames = {}
+    for base, intervals in plan.items():
+        df = store.read('binance', ticker, base, candle_count=base_count(base))
+        for interval in intervals:
+            frames[interval] = df if interval == base else resample.resample(df, interval)
+    return frames
+
+
+def main(frames, ticker):
+    """
+    Writes the levels of every timeframe of ticker to all_timeframes.txt, all of them from one batch_levels call
+    (one per candle count when some timeframe has fewer than candle_count candles).
+    :param frames: Timeframe name (e.g. '1H') -> candles, oldest first
+    """
+    frames = {i: df.tail(candle_count) for i, df in frames.items()}
+    rows = {}
+    for length in dict.fromkeys(len(df) for df in frames.values()):
+        names = [i for i, df in frames.items() if len(df) == length]
+        high, low, close = (np.array([frames[i][column].to_numpy(dtype=float) for i in names])
+                            for column in ('high', 'low', 'close'))
+        # batch_levels repeats every row's latest candle once like main() did with df.tail(1)
+        rows.update(zip(names, pivots.batch_levels(high, low, close, sens=2).rows()))
 
-
-def hist_data():
-    header_list = ['unix', 'open', 'high', 'low', 'close', 'volume', 'close time', 'Volume USDT', 'tradecount',
-                   'taker buy vol', 'taker buy quote vol', 'ignore']
-
-    def historical_data_write(self):
-        """
-        The function writes the data to a csv file
-        """
-        data = self + ".csv"
-        csv_file_write = open(data, "w", newline='')
-        klines_writer = csv.writer(csv_file_write, delimiter=",")
-        for candlestick in candlesticks:
-            klines_writer.writerow(candlestick)
-        csv_file_write.close()
-        df = pd.read_csv(data)
-        df = df.iloc[::-1]
-        df.to_csv(data, header=header_list, index=False)
-
-    candlesticks = client.get_historical_klines(ticker, time_frame, start, limit=300)
-    historical_data_write(ticker)
-
-
-def main():
-    df = pd.read_csv(file_name, delimiter=',', encoding="utf-8-sig", index_col=False, nrows=254, keep_default_na=False)
-    df = df.iloc[::-1]
-    df.reset_index(drop=True, inplace=True)
-    df = pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
-    ss, rr, new_res, new_sup = [], [], [], []
-
-    def support(candle_value, candle_index, before_candle_count, after_candle_count):
-        """
-                If the price of the asset is increasing for the last before_candle_count and decreasing for
-                the last after_candle_count, then return 1. Otherwise, return 0
-                :param candle_value: The price data for the asset
-                :param candle_index: The index of the first bar in the support
-                :param before_candle_count: The number of bars back you want to look
-                :param after_candle_count: The number of bars in the second trend
-                :return: 1 if the price of the asset is supported by the previous low price, and 0 if it is not.
-                """
-        try:
-            for current_value in range(candle_index - before_candle_count + 1, candle_index + 1):
-                if candle_value.low[current_value] > candle_value.low[current_value - 1]:
-                    return 0
-            for current_value in range(candle_index + 1, candle_index + after_candle_count + 1):
-                if candle_value.low[current_value] < candle_value.low[current_value - 1]:
-                    return 0
-            return 1
-        except KeyError:
-            pass
-
-    def resistance(candle_value, candle_index, before_candle_count, after_candle_count):
-        """
-        If the price of the stock is increasing for the last before_candle_count and decreasing for
-        the last after_candle_count, then return 1. Otherwise, return 0
-        :param candle_value: The price data for the asset
-        :param candle_index: The index of the first bar in the resistance
-        :param before_candle_count: The number of bars back you want to look
-        :param after_candle_count: The number of days after the first resistance line where the price will be considered
-        to be broken
-        :return: 1 if the price has been increasing for the last n1 periods and decreasing for the last
-        n2 periods.
-        """
-        try:
-            for current_value in range(candle_index - before_candle_count + 1, candle_index + 1):
-                if candle_value.high[current_value] < candle_value.high[current_value - 1]:
-                    return 0
-            for current_value in range(candle_index + 1, candle_index + after_candle_count + 1):
-                if candle_value.high[current_value] > candle_value.high[current_value - 1]:
-                    return 0
-            return 1
-        except KeyError:
-            pass
-
-    def drop_null():
-        """
-        Drop all rows with NULL values in the dataframe
-        """
-        for col in df.columns:
-            index_null = df[df[col] == "NULL"].index
-            df.drop(index_null, inplace=True)
-            df.isna().sum()
-
-    drop_null()
-    df = df[:len(df)]
-
-    def sensitivity(sens):
-        for row in range(3, len(df) - 1):
-            if support(df, row, 3, sens):
-                ss.append((row, df.low[row]))
-            if resistance(df, row, 3, sens):
-                rr.append((row, df.high[row]))
-
-    sensitivity(2)
-
-    sup_below = []
-    res_above = []
-    sup = tuple(map(lambda sup1: sup1[1], ss))
-    res = tuple(map(lambda res1: res1[1], rr))
-    latest_close = tuple(df['close'])[-1]
-
-    def supres():
-        for s in sup:
-            if s < latest_close:
-                sup_below.append(s)
-            else:
-                new_res.append(s)
-
-        for r in res:
-            if r > latest_close:
-                res_above.append(r)
-            else:
-                new_sup.append(r)
-
-    supres()
-
-    sup_below.extend(new_sup)
-    res_above.extend(new_res)
-    sup_below = sorted(sup_below, reverse=True)
-    res_above = sorted(res_above)
-    if not sup_below:
-        sup_below.append(min(df['low']))
-
-    if not res_above:
-        res_above.append(min(df['high']))
-
-    res_above = [float(a) for a in res_above]
-    sup_below = [float(a) for a in sup_below]
-
-    print('res:', res_above)
-    print('sup:', sup_below)
     with open('../main_supres/all_timeframes.txt', 'a') as f:
-        f.writelines([ticker, " ", i, "\nResistance:", str(res_above), "\nSupport:", str(sup_below), "\n\n"])
+        for i in frames:
+            res_above, sup_below = rows[i]
+            print(i)
+            print('res:', res_above)
+            print('sup:', sup_below)
+            f.writelines([ticker, " ", i, "\nResistance:", str(res_above), "\nSupport:", str(sup_below), "\n\n"])
 
 
 if __name__ == "__main__":
     perf = time.perf_counter()
-    client = Client("", "")
+    client = market_data.binance_client()
     ticker_list = ['BTCUSDT', 'ETHUSDT']  # Add coin pairs here, it will generate all_timeframes.txt file
     frame_s = ('3M', '5M', '15M', '30M', '1H', '2H', '4H', '6H', '8H', '12H', '1D', '3D')
     timestamp = client.get_server_time().get('serverTime') / 1000
@@ -151,23 +75,26 @@ if __name__ == "__main__":
     with open('../main_supres/all_timeframes.txt', 'w') as file:
         file.writelines(["Server time: ", server_time, "\n"])
     print(f"Server time: {server_time}")
-    for ticker in ticker_list:
-        print("----", ticker, "----")
-        file_name = "../main_supres/" + str(ticker).upper() + ".csv"
-        for i in frame_s:
-            time_frame = frameselect.frame_select(i)[0]
-            start = frameselect.frame_select(i)[1]
-            print(i)
-            try:
-                hist_data()
-                main()
-                if os.path.exists(file_name):
-                    os.remove(file_name)
-                else:
-                    print("The file does not exist.")
-                print(f"Completed execution in {time.perf_counter() - perf} seconds")
-            except KeyError:
-                print("ERROR")
-                os.remove(file_name)
-                pass
+    store = CandleStore()
+    plan = resample.plan_bases([frameselect.frame_select_dict[i][0] for i in frame_s], candle_count + 1,
+                               max_base_candles)
+    print("Base intervals:", plan)
+    # Downloads run concurrently, a ticker is analyzed as soon as all of its base intervals are stored
+    scheduler = fetch_scheduler.FetchScheduler(market_data.binance_client(fetch_scheduler.KlineFetcher),
+                                               max_workers=8)
+    pending = {ticker: set(plan) for ticker in ticker_list}
+    for job, klines, error in scheduler.run([job for ticker in ticker_list for job in hist_jobs(ticker)]):
+        if error is not None:
+            print("ERROR", job.symbol, job.interval, error)
+            pending.pop(job.symbol, None)
+            continue
+        store.write('binance', job.symbol, job.interval, klines)
+        if job.symbol not in pending:
+            continue
+        pending[job.symbol].discard(job.interval)
+        if not pending[job.symbol]:
+            del pending[job.symbol]
+            print("----", job.symbol, "----")
+            frames = hist_data(job.symbol)
+            main({i: frames[frameselect.frame_select_dict[i][0]] for i in frame_s}, job.symbol)
     print(f"Completed execution in {time.perf_counter() - perf} seconds")
@@ -0,0 +1,168 @@
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+import duckdb
+import pandas as pd
+from frameselect import FetchPlan, fetch_klines, fetch_plan
+from klines import kline_array, kline_fields, kline_frame
+
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "candles.ddb")
+candles_table = """
+    CREATE TABLE IF NOT EXISTS candles (
+        source VARCHAR, symbol VARCHAR, interval VARCHAR, open_time BIGINT,
+        open DOUBLE, high DOUBLE, low DOUBLE, close DOUBLE, volume DOUBLE, close_time BIGINT,
+        PRIMARY KEY (source, symbol, interval, open_time))"""
+
+
+class StoreLockedError(Exception):
+    """
+    The store file stayed locked by another process for longer than the store's lock_timeout.
+    """
+
+
+@dataclass
+class CandleStore:
+    """
+    Local OHLCV table keyed by (source, symbol, interval, open_time). Runs only download the candles after
+    the last stored one, and analysis reads come straight from the table instead of a CSV round trip.
+    DuckDB lets only one process write a file, and the Streamlit app, the telegram bot processes and
+    all_timeframe_sr share this one, so every call opens a short-lived connection (read-only for reads) and
+    retries while another process holds the lock.
+    """
+    path: str = default_path
+    lock_timeout: float = 10.0  # Seconds to keep retrying a locked file before StoreLockedError
+    tables: list = field(default_factory=lambda: [candles_table])  # Created on every write connection
+
+    @contextmanager
+    def connect(self, read_only=False):
+        """
+        Short-lived connection to the store file, retried while another process holds its lock.
+        """
+        deadline, delay = time.monotonic() + self.lock_timeout, 0.02
+        while True:
+            try:
+                connection = duckdb.connect(self.path, read_only=read_only)
+                break
+            except (duckdb.IOException, duckdb.ConnectionException) as error:
+                # Another process holds the lock, or another thread has the file open in the other mode
+                if 'lock' not in str(error).lower() and 'different configuration' not in str(error):
+                    raise
+                if time.monotonic() >= deadline:
+                    raise StoreLockedError(f"{self.path} is locked by another process") from error
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+        try:
+            if not read_only:
+                for table in self.tables:
+                    connection.execute(table)
+            yield connection
+        finally:
+            connection.close()
+
+    def query(self, sql, parameters=()) -> list:
+        """
+        Rows of a read-only query, none while the file or its tables do not exist yet.
+        """
+        if not os.path.isfile(self.path):
+            return []
+        with self.connect(read_only=True) as connection:
+            try:
+                return connection.execute(sql, parameters).fetchall()
+            except duckdb.CatalogException:
+                return []
+
+    def close(self):
+        """
+        Nothing stays open between calls, kept for callers that close the store.
+        """
+
+    def last_open_time(self, source, symbol, interval) -> int:
+        """
+        Open time in ms of the newest stored candle, None if there is nothing stored yet.
+        """
+        rows = self.query("SELECT max(open_time) FROM candles WHERE source = ? AND symbol = ? AND interval = ?",
+                          [source, symbol, interval])
+        return rows[0][0] if rows else None
+
+    def write(self, source, symbol, interval, klines, replace=False) -> int:
+        """
+        Stores Binance klines [open time, open, high, low, close, volume, close time, ...], a candle that is
+        already stored is replaced, so the still open latest candle gets its final values on the next run.
+        :param replace: Drop every stored candle of the key first, in the same transaction
+        :return: Number of klines written
+        """
+        if not len(klines):
+            return 0
+        values = kline_array(klines, field_count=len(kline_fields))
+        frame = pd.DataFrame({name: values[:, column] for column, name in enumerate(kline_fields)})
+        frame = frame.astype({'open_time': 'int64', 'close_time': 'int64'})
+        with self.connect() as connection:
+            connection.begin()
+            if replace:
+                connection.execute("DELETE FROM candles WHERE source = ? AND symbol = ? AND interval = ?",
+                                   [source, symbol, interval])
+            connection.register('new_candles', frame)
+            connection.execute(
+                f"INSERT OR REPLACE INTO candles SELECT ?, ?, ?, {', '.join(kline_fields)} FROM new_candles",
+                [source, symbol, interval])
+            connection.commit()
+        return len(frame)
+
+    def top_up(self, client, symbol, interval, candle_count=254, source='binance', now=None) -> int:
+        """
+        Downloads the klines from the last stored one on, or the latest candle_count for a new key.
+        :param client: binance Client or anything with the same get_klines()
+        :param now: Current time in ms, defaults to the clock
+        :return: Number of klines written
+        """
+        plan = self.top_up_plan(symbol, interval, candle_count, source, now)
+        return self.write(source, symbol, interval, fetch_klines(client, symbol, plan))
+
+    def top_up_plan(self, symbol, interval, candle_count=254, source='binance', now=None) -> FetchPlan:
+        """
+        The requests top_up() makes, the last stored candle is downloaded again as it may have still been open.
+        A store older than the candle_count window only gets the window, not every candle since.
+        """
+        last_open_time = self.last_open_time(source, symbol, interval)
+        window = fetch_plan(interval, candle_count, now=now)
+        if last_open_time is None or last_open_time < window.start_time:
+            return window
+        return fetch_plan(interval, start_time=last_open_time, now=now)
+
+    def candles(self, client, symbol, interval, candle_count=254, source='binance', now=None) -> pd.DataFrame:
+        """
+        top_up() then read(), the way the entry points use the store. While the file stays locked the candles
+        are downloaded without the store and returned as they are.
+        """
+        try:
+            self.top_up(client, symbol, interval, candle_count, source, now)
+            return self.read(source, symbol, interval, candle_count)
+        except StoreLockedError:
+            df = kline_frame(fetch_klines(client, symbol, fetch_plan(interval, candle_count, now=now)))
+            return df.tail(candle_count).reset_index(drop=True)
+
+    def read(self, source, symbol, interval, candle_count=None) -> pd.DataFrame:
+        """
+        Returns the latest candle_count stored candles, oldest first, with unix (open time in ms), date, open,
+        high, low, close and volume columns.
+        """
+        sql = "SELECT open_time AS unix, open, high, low, close, volume FROM candles " \
+              "WHERE source = ? AND symbol = ? AND interval = ? ORDER BY open_time DESC"
+        if candle_count is not None:
+            sql += f" LIMIT {int(candle_count)}"
+        rows = self.query(sql, [source, symbol, interval])[::-1]
+        df = pd.DataFrame(rows, columns=['unix', 'open', 'high', 'low', 'close', 'volume'])
+        df = df.astype({'unix': 'int64', 'open': 'float64', 'high': 'float64', 'low': 'float64',
+                        'close': 'float64', 'volume': 'float64'})
+        df.insert(1, 'date', pd.to_datetime(df['unix'], unit='ms'))
+        return df
+
+
+@lru_cache(maxsize=None)
+def shared_store(path=default_path) -> CandleStore:
+    """
+    One CandleStore per file and process, so Streamlit reruns do not build a new one each time.
+    """
+    return CandleStore(path)
@@ -0,0 +1,151 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import pandas as pd
+import requests
+from frameselect import FetchPlan, fetch_klines
+
+
+class TokenBucket:
+    """
+    Request weight budget shared by every fetch thread. It refills continuously up to capacity per period,
+    follows the used weight Binance reports and stops everyone while a Retry-After is pending.
+    """
+    def __init__(self, capacity=1200, period=60.0, clock=time.monotonic, sleep=time.sleep):
+        self.capacity, self.rate = capacity, capacity / period
+        self.clock, self.sleep = clock, sleep
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, weight=1):
+        """
+        Blocks until weight tokens are available and takes them.
+        """
+        weight = min(weight, self.capacity)
+        while True:
+            with self.lock:
+                now = self.clock()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        return
+                    wait = (weight - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def observe_used(self, used_weight):
+        """
+        Lowers the budget to what the server says is left, X-MBX-USED-WEIGHT-1M counts every client of the IP.
+        """
+        with self.lock:
+            self._refill(self.clock())
+            self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+def klines_weight(limit) -> int:
+    """
+    Request weight of GET /api/v3/klines for a limit.
+    """
+    return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+
+
+def to_milliseconds(start) -> int:
+    if isinstance(start, (int, float)):
+        return int(start)
+    return int(pd.Timestamp(start).value // 1_000_000)
+
+
+class KlineFetcher:
+    """
+    Minimal Binance klines client for fetch threads, one requests session per thread and every call paid for
+    from a shared TokenBucket. get_klines and get_historical_klines work like binance.Client's, so it can stand
+    in for the client in CandleStore.top_up and frameselect.fetch_klines.
+    """
+    def __init__(self, base_url='https://api.binance.com', bucket=None, timeout=10, max_retries=5):
+        self.base_url = base_url.rstrip('/')
+        self.bucket = bucket or TokenBucket()
+        self.timeout, self.max_retries = timeout, max_retries
+        self.local = threading.local()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def get(self, path, params=None, weight=1):
+        """
+        GET a public endpoint, waiting for the weight budget first and retrying 429/418 answers after their
+        Retry-After.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(weight)
+            response = self._session().get(self.base_url + path, params=params, timeout=self.timeout)
+            used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M', response.headers.get('X-MBX-USED-WEIGHT'))
+            if used_weight is not None:
+                self.bucket.observe_used(int(used_weight))
+            if response.status_code in (418, 429) and attempt < self.max_retries:
+                self.bucket.pause(float(response.headers.get('Retry-After', 1)))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def get_klines(self, symbol, interval, startTime=None, limit=500) -> list:
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if startTime is not None:
+            params['startTime'] = to_milliseconds(startTime)
+        return self.get('/api/v3/klines', params, weight=klines_weight(limit))
+
+    def get_historical_klines(self, symbol, interval, start_str, limit=1000) -> list:
+        """
+        Every kline from start_str (ms or a date string) up to now, downloaded limit klines per request.
+        """
+        klines, start_time = [], to_milliseconds(start_str)
+        while True:
+            batch = self.get_klines(symbol, interval, start_time, limit)
+            klines.extend(batch)
+            if len(batch) < limit:
+                return klines
+            start_time = batch[-1][0] + 1
+
+
+@dataclass
+class FetchJob:
+    symbol: str
+    plan: FetchPlan
+
+    @property
+    def interval(self) -> str:
+        return self.plan.interval
+
+
+class FetchScheduler:
+    """
+    Downloads FetchJobs on a thread pool and hands each one back as soon as it is done.
+    """
+    def __init__(self, fetcher=None, max_workers=8):
+        self.fetcher = fetcher or KlineFetcher()
+        self.max_workers = max_workers
+
+    def run(self, jobs):
+        """
+        :return: Generator of (job, klines, error) in completion order, error is None when the job succeeded
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(fetch_klines, self.fetcher, job.symbol, job.plan): job for job in jobs}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as error:
+                    yield futures[future], [], error
@@ -1,3 +1,5 @@
+import time
+from dataclasses import dataclass
 from binance import Client
 from datetime import datetime, timedelta
 
@@ -25,3 +27,71 @@ def frame_select(kline: str) -> tuple:  # [str | int, str]:
              "D": timedelta(days=kline_interval)}
     start_date += times[last_letter]
     return frame_select_dict[kline][0], start_date.strftime("%d %B, %Y")
+
+
+minute, hour, day = 60_000, 3_600_000, 86_400_000
+# Kline interval -> length in ms, Binance opens every bucket on a multiple of it counted from the epoch
+interval_ms = {Client.KLINE_INTERVAL_1MINUTE: minute,
+               Client.KLINE_INTERVAL_3MINUTE: 3 * minute,
+               Client.KLINE_INTERVAL_5MINUTE: 5 * minute,
+               Client.KLINE_INTERVAL_15MINUTE: 15 * minute,
+               Client.KLINE_INTERVAL_30MINUTE: 30 * minute,
+               Client.KLINE_INTERVAL_1HOUR: hour,
+               Client.KLINE_INTERVAL_2HOUR: 2 * hour,
+               Client.KLINE_INTERVAL_4HOUR: 4 * hour,
+               Client.KLINE_INTERVAL_6HOUR: 6 * hour,
+               Client.KLINE_INTERVAL_8HOUR: 8 * hour,
+               Client.KLINE_INTERVAL_12HOUR: 12 * hour,
+               Client.KLINE_INTERVAL_1DAY: day,
+               Client.KLINE_INTERVAL_3DAY: 3 * day,
+               Client.KLINE_INTERVAL_1WEEK: 7 * day}
+interval_offset_ms = {Client.KLINE_INTERVAL_1WEEK: 4 * day}  # Weeks open on Monday, the epoch was a Thursday
+max_klines_limit = 1000  # Most klines one request returns
+
+
+@dataclass
+class FetchPlan:
+    interval: str
+    start_time: int  # Open time in ms of the first candle to download
+    candle_count: int  # Candles to download, the still open latest one included
+    pages: tuple  # (startTime, limit) of every klines request
+
+
+def open_time(interval, now=None) -> int:
+    """
+    Open time in ms of the interval candle that is still open at now (ms, defaults to the current time).
+    """
+    now = int(time.time() * 1000) if now is None else now
+    length, offset = interval_ms[interval], interval_offset_ms.get(interval, 0)
+    return (now - offset) // length * length + offset
+
+
+def fetch_plan(interval, candle_count=254, start_time=None, now=None, max_limit=max_klines_limit) -> FetchPlan:
+    """
+    Works out the exact klines requests for the latest candle_count candles, or for every candle from start_time
+    on when it is given, in as few requests as possible.
+    :param interval: Kline interval, e.g. '4h'
+    :param candle_count: Number of candles the analysis reads
+    :param start_time: Open time in ms of the first candle to download instead of counting back from now
+    :param now: Current time in ms, defaults to the clock
+    :param max_limit: Most klines per request
+    """
+    length, latest = interval_ms[interval], open_time(interval, now)
+    if start_time is None:
+        start_time = latest - (candle_count - 1) * length
+    else:
+        start_time = latest + min(start_time - latest, 0) // length * length  # Its candle's open time
+        candle_count = (latest - start_time) // length + 1
+    pages = tuple((start_time + first * length, min(max_limit, candle_count - first))
+                  for first in range(0, candle_count, max_limit))
+    return FetchPlan(interval, start_time, candle_count, pages)
+
+
+def fetch_klines(client, symbol, plan) -> list:
+    """
+    Downloads the klines of a FetchPlan, one get_klines request per page.
+    """
+    klines = []
+    for start_time, limit in plan.pages:
+        klines.extend(client.get_klines(symbol=symbol, interval=plan.interval, startTime=start_time, limit=limit))
+    return klines
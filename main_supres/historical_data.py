@@ -1,7 +1,7 @@
-import csv
 import pandas as pd
-from binance.client import Client
 import frameselect
+import market_data
+from klines import export_csv, kline_frame
 
 print("Ticker and Time Frame:")  # Example:"BTCUSDT 1H", "ETHBTC 3D", "BNBUSDT 15M"
 if False:
@@ -10,10 +10,10 @@ else:
     ticker, frame_s = 'BTCUSDT 1D'.split()
 
 time_frame = frameselect.frame_select(frame_s)[0]
-start = frameselect.frame_select(frame_s)[1]
+candle_count = 254  # Number of candles the analysis reads
 is_binance_ticker = True
 # Creating a client object that is used to interact with the Binance API
-client = Client("", "")
+client = market_data.binance_client()
 if any(ticker == i.get('symbol') for i in client.get_all_tickers()):  # Check pair is in Binance API
     print("Pair is in Binance API.")
 else:
@@ -23,25 +23,19 @@ else:
 
 file_name = ticker + ".csv"
 symbol_data = client.get_symbol_info(ticker)
-header_list = ('unix', 'open', 'high', 'low', 'close', 'volume', 'close time', 'volume', 'tradecount',
-               'taker buy vol', 'taker buy quote vol', 'ignore')
+
+
+def historical_data_frame(ticker_symbol) -> pd.DataFrame:
+    """
+    Download the historical data straight into an analysis frame, oldest candle first
+    """
+    plan = frameselect.fetch_plan(time_frame, candle_count)
+    return kline_frame(frameselect.fetch_klines(client, ticker_symbol, plan))
 
 
 def historical_data_write(ticker_symbol):
     """
-    Write the historical data to a csv file
+    Write the historical data to a csv file, only needed to export it
     """
-    csv_file_w = open(file_name, "w", newline='')
-    klines_writer = csv.writer(csv_file_w, delimiter=",")
-    klines_writer.writerow(header_list)
-    for candlestick in reversed(client.get_historical_klines(symbol=ticker_symbol, interval=time_frame,
-                                                             start_str=start, limit=300)):
-        klines_writer.writerow(candlestick)
-    csv_file_w.close()
-    df = pd.read_csv(file_name)
-    # Converting the unix time to a readable date format for today
-    date = pd.to_datetime(df['unix'], unit='ms')
-    df.insert(1, 'date', date)
-    df.drop(labels=["unix", "volume.1", "close time", "tradecount", "taker buy vol", "taker buy quote vol", "ignore"], inplace=True, axis=1)
-    df.to_csv(file_name, index=False)
+    export_csv(historical_data_frame(ticker_symbol), file_name)
     print("Data writing:", file_name)
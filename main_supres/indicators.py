@@ -0,0 +1,234 @@
+from collections import deque
+from dataclasses import dataclass
+import math
+import numpy as np
+
+nan = float('nan')
+
+
+class SmaState:
+    """
+    Simple moving average kept as a running sum over the latest window closes.
+    """
+    def __init__(self, window):
+        self.window = window
+        self.closes = deque(maxlen=window)
+        self.total = 0.0
+        self.value = nan
+
+    def update(self, close) -> float:
+        if len(self.closes) == self.window:
+            self.total -= self.closes[0]
+        self.closes.append(close)
+        self.total += close
+        if len(self.closes) == self.window:
+            self.value = self.total / self.window
+        return self.value
+
+
+class EmaState:
+    """
+    Exponential moving average seeded with the simple average of the first length closes, like pandas_ta.ema.
+    """
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2 / (length + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = nan
+
+    def update(self, close) -> float:
+        self.count += 1
+        if self.count < self.length:
+            self.total += close
+        elif self.count == self.length:
+            self.value = (self.total + close) / self.length
+        else:
+            self.value += self.alpha * (close - self.value)
+        return self.value
+
+
+class RsiState:
+    """
+    Relative strength index with Wilder's smoothing (alpha 1/length). pandas_ta uses the adjusted exponential
+    average, whose gain and loss averages share the same weights, so only the two decayed sums are kept.
+    """
+    def __init__(self, length=14):
+        self.length = length
+        self.decay = 1 - 1 / length
+        self.gain_sum = self.loss_sum = 0.0
+        self.changes = 0
+        self.previous_close = None
+        self.value = nan
+
+    def update(self, close) -> float:
+        if self.previous_close is not None:
+            change = close - self.previous_close
+            self.gain_sum = max(change, 0.0) + self.decay * self.gain_sum
+            self.loss_sum = max(-change, 0.0) + self.decay * self.loss_sum
+            self.changes += 1
+            if self.changes >= self.length and self.gain_sum + self.loss_sum > 0:
+                self.value = 100 * self.gain_sum / (self.gain_sum + self.loss_sum)
+            else:
+                self.value = nan
+        self.previous_close = close
+        return self.value
+
+
+class MacdState:
+    """
+    MACD line, signal and histogram like pandas_ta.macd, the signal EMA starts at the first MACD value.
+    """
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = EmaState(fast), EmaState(slow), EmaState(signal)
+        self.value = self.signal_value = self.histogram = nan
+
+    def update(self, close) -> tuple:  # [float, float, float]:
+        self.value = self.fast.update(close) - self.slow.update(close)
+        if not math.isnan(self.value):
+            self.signal_value = self.signal.update(self.value)
+            self.histogram = self.value - self.signal_value
+        return self.value, self.signal_value, self.histogram
+
+
+def decayed_sums(values, decay, block=32) -> np.ndarray:
+    """
+    sums[t] = values[t] + decay * sums[t - 1], the recursion behind exponential averages, vectorized within
+    blocks of candles. decay ** -block stays small, so the closed form inside a block keeps full precision.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.empty(len(values))
+    powers = decay ** np.arange(block)
+    carry = 0.0
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        weights = powers[:len(chunk)]
+        sums[start:start + len(chunk)] = np.cumsum(chunk / weights) * weights + weights * decay * carry
+        carry = sums[start + len(chunk) - 1]
+    return sums
+
+
+def sma(close, window) -> np.ndarray:
+    """
+    Simple moving average of close, NaN until the first full window, the values of SmaState.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(len(close), np.nan)
+    if 0 < window <= len(close):
+        total = np.concatenate([[0.0], np.cumsum(close)])
+        result[window - 1:] = (total[window:] - total[:-window]) / window
+    return result
+
+
+def ema(close, length) -> np.ndarray:
+    """
+    Exponential moving average seeded with the simple average of the first length closes, the values of EmaState.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(len(close), np.nan)
+    if 0 < length <= len(close):
+        alpha = 2 / (length + 1)
+        values = alpha * close[length - 1:]
+        values[0] = close[:length].mean()
+        result[length - 1:] = decayed_sums(values, 1 - alpha)
+    return result
+
+
+def rsi(close, length=14) -> np.ndarray:
+    """
+    Relative strength index with the adjusted Wilder smoothing of pandas_ta, the values of RsiState.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    result = np.full(len(close), np.nan)
+    if len(close) < 2:
+        return result
+    changes = np.diff(close)
+    gains = decayed_sums(np.maximum(changes, 0.0), 1 - 1 / length)
+    losses = decayed_sums(np.maximum(-changes, 0.0), 1 - 1 / length)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[1:] = np.where((np.arange(1, len(changes) + 1) >= length) & (gains + losses > 0),
+                              100 * gains / (gains + losses), np.nan)
+    return result
+
+
+def macd(close, fast=12, slow=26, signal=9) -> tuple:  # [np.ndarray, np.ndarray, np.ndarray]:
+    """
+    MACD line, signal and histogram, the values of MacdState.
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = np.full(len(line), np.nan)
+    valid = np.flatnonzero(~np.isnan(line))
+    if len(valid):
+        signal_line[valid[0]:] = ema(line[valid[0]:], signal)
+    return line, signal_line, line - signal_line
+
+
+def indicator_series(closes, sma_windows=(20, 50, 100), rsi_length=14, macd_lengths=(12, 26, 9)) -> dict:
+    """
+    Every indicator of a whole close series in array operations, the same keys and values as IndicatorState.run
+    without feeding the closes one at a time. IndicatorState is for moving forward candle by candle.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    series = {f'SMA{window}': sma(closes, window) for window in sma_windows}
+    series['RSI'] = rsi(closes, rsi_length)
+    series['MACD'], series['MACDs'], series['MACDh'] = macd(closes, *macd_lengths)
+    return series
+
+
+@dataclass
+class IndicatorState:
+    """
+    SMA, RSI and MACD of a close series that can be seeded from history and then moved forward one closed
+    candle at a time in constant time.
+    """
+    sma_windows: tuple = (20, 50, 100)
+    rsi_length: int = 14
+    macd_lengths: tuple = (12, 26, 9)
+
+    def __post_init__(self):
+        self.smas = {window: SmaState(window) for window in self.sma_windows}
+        self.rsi = RsiState(self.rsi_length)
+        self.macd = MacdState(*self.macd_lengths)
+
+    @classmethod
+    def from_closes(cls, closes, **kwargs):
+        """
+        Creates a state and feeds it historical closes, oldest first.
+        """
+        state = cls(**kwargs)
+        state.run(closes)
+        return state
+
+    def update(self, close) -> dict:
+        """
+        Adds the close of a new candle.
+        :return: The latest values, see values
+        """
+        close = float(close)
+        for average in self.smas.values():
+            average.update(close)
+        self.rsi.update(close)
+        self.macd.update(close)
+        return self.values
+
+    @property
+    def values(self) -> dict:
+        """
+        Latest value of every indicator, SMA{window} keys, then RSI, MACD, MACDs (signal) and MACDh (histogram).
+        """
+        values = {f'SMA{window}': sma.value for window, sma in self.smas.items()}
+        values.update(RSI=self.rsi.value, MACD=self.macd.value, MACDs=self.macd.signal_value,
+                      MACDh=self.macd.histogram)
+        return values
+
+    def run(self, closes) -> dict:
+        """
+        Feeds closes, oldest first, and collects every value along the way, handy for charting a history.
+        :return: The same keys as values, each holding an array with one entry per close
+        """
+        closes = np.asarray(closes, dtype=np.float64)
+        series = {name: np.full(len(closes), np.nan) for name in self.values}
+        for candle, close in enumerate(closes.tolist()):
+            for name, value in self.update(close).items():
+                series[name][candle] = value
+        return series
@@ -0,0 +1,139 @@
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass, field
+import websockets
+from frameselect import fetch_klines, fetch_plan, frame_select_dict, interval_ms
+from klines import kline_frame
+from streaming import StreamingSupres
+
+default_url = 'wss://stream.binance.com:9443'
+
+
+def stream_name(symbol, interval) -> str:
+    return f"{symbol.lower()}@kline_{interval}"
+
+
+def event_kline(event) -> tuple:  # [str, str, list, bool]:
+    """
+    Unpacks a kline stream event into symbol, interval, the kline as get_klines returns it
+    [open time, open, high, low, close, volume, close time] and whether the candle is closed.
+    """
+    k = event['k']
+    return k['s'], k['i'], [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T']], k['x']
+
+
+@dataclass
+class KlineStream:
+    """
+    Subscribes to the Binance kline streams of a watchlist and keeps the latest candle_count closed candles of
+    every symbol and interval in a ring buffer, plus the candle that is still open. Every closed candle also
+    goes into a StreamingSupres of its symbol and interval, then the on_close callbacks are called with
+    (symbol, interval, detector), no request is made on the way.
+    :param frames: Frame names of frameselect.frame_select_dict, e.g. ('1H', '4H')
+    """
+    symbols: tuple
+    frames: tuple = ('1H',)
+    candle_count: int = 254
+    url: str = default_url
+    supres_kwargs: dict = field(default_factory=dict)
+    on_close: list = field(default_factory=list)
+
+    def __post_init__(self):
+        self.symbols = tuple(symbol.upper() for symbol in self.symbols)
+        self.intervals = tuple(frame_select_dict[frame][0] for frame in self.frames)
+        self.keys = [(symbol, interval) for symbol in self.symbols for interval in self.intervals]
+        self.closed = {key: deque(maxlen=self.candle_count) for key in self.keys}
+        self.open = {key: None for key in self.keys}
+        self.detectors = {key: StreamingSupres(candle_count=self.candle_count, **self.supres_kwargs)
+                          for key in self.keys}
+
+    @property
+    def stream_url(self) -> str:
+        streams = '/'.join(stream_name(symbol, interval) for symbol, interval in self.keys)
+        return f"{self.url.rstrip('/')}/stream?streams={streams}"
+
+    def seed(self, client, now=None):
+        """
+        Fills the buffers over REST, with the latest candles on the first call and with the ones missed
+        while disconnected later on.
+        :param client: binance Client or anything with the same get_klines()
+        """
+        for symbol, interval in self.keys:
+            closed = self.closed[symbol, interval]
+            if closed:
+                plan = fetch_plan(interval, start_time=closed[-1][0] + interval_ms[interval], now=now)
+            else:
+                plan = fetch_plan(interval, self.candle_count + 1, now=now)
+            klines = fetch_klines(client, symbol, plan)
+            for kline in klines[:-1]:  # The latest one is still open
+                self.add(symbol, interval, kline, closed=True, notify=False)
+            if klines:
+                self.add(symbol, interval, klines[-1], closed=False)
+
+    def add(self, symbol, interval, kline, closed, notify=True) -> bool:
+        """
+        Puts a kline into its buffers, klines not newer than the last closed one are ignored.
+        :return: True if a candle closed
+        """
+        key = (symbol, interval)
+        buffer = self.closed[key]
+        if buffer and kline[0] <= buffer[-1][0]:
+            return False
+        if not closed:
+            self.open[key] = kline
+            return False
+        buffer.append(kline)
+        if self.open[key] is not None and self.open[key][0] <= kline[0]:
+            self.open[key] = None
+        detector = self.detectors[key]
+        detector.update(kline)
+        if notify:
+            for callback in self.on_close:
+                callback(symbol, interval, detector)
+        return True
+
+    def handle(self, message) -> bool:
+        """
+        Processes one combined stream message.
+        :return: True if it closed a candle
+        """
+        event = json.loads(message)
+        event = event.get('data', event)
+        if event.get('e') != 'kline':
+            return False
+        symbol, interval, kline, closed = event_kline(event)
+        if (symbol, interval) not in self.closed:
+            return False
+        return self.add(symbol, interval, kline, closed)
+
+    def frame(self, symbol, interval, include_open=False):
+        """
+        The buffered candles as a klines.kline_frame, oldest first.
+        """
+        klines = list(self.closed[symbol.upper(), interval])
+        if include_open and self.open[symbol.upper(), interval] is not None:
+            klines.append(self.open[symbol.upper(), interval])
+        return kline_frame(klines)
+
+    async def run(self, client=None, reconnect=True, retry_delay=1.0):
+        """
+        Listens to the streams until cancelled, or until the server closes when reconnect is False.
+        :param client: If given, the buffers are seeded from it before every (re)connection
+        """
+        while True:
+            if client is not None:
+                await asyncio.get_running_loop().run_in_executor(None, self.seed, client)
+            try:
+                async with websockets.connect(self.stream_url) as websocket:
+                    async for message in websocket:
+                        self.handle(message)
+            except (OSError, websockets.ConnectionClosedError):
+                if not reconnect:
+                    raise
+            if not reconnect:
+                return
+            await asyncio.sleep(retry_delay)
+
+    def run_forever(self, client=None):
+        asyncio.run(self.run(client))
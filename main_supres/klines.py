@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+kline_fields = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+
+
+def kline_array(klines, field_count=6) -> np.ndarray:
+    """
+    Converts Binance klines [open time, open, high, low, close, volume, close time, ...] into one float64
+    array with a row per kline and the first field_count fields as columns. Open times in ms fit a float64
+    exactly, so they can be cast back to int64 without loss.
+    """
+    if not len(klines):
+        return np.empty((0, field_count))
+    return np.array([kline[:field_count] for kline in klines], dtype=np.float64)
+
+
+def kline_frame(klines) -> pd.DataFrame:
+    """
+    Builds the analysis frame straight from Binance klines: unix (open time in ms), date, open, high, low,
+    close and volume columns, oldest first, no CSV round trip.
+    """
+    values = kline_array(klines)
+    unix = values[:, 0].astype(np.int64)
+    return pd.DataFrame({'unix': unix, 'date': pd.to_datetime(unix, unit='ms'), 'open': values[:, 1],
+                         'high': values[:, 2], 'low': values[:, 3], 'close': values[:, 4], 'volume': values[:, 5]})
+
+
+def export_csv(df, file_name):
+    """
+    Writes a kline frame in the old CSV layout (newest candle first, no unix column), only for export.
+    """
+    df.drop(columns='unix').iloc[::-1].to_csv(file_name, index=False)
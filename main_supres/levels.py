@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+import numpy as np
+
+
+@dataclass
+class Level:
+    price: float  # Representative price of the zone
+    low: float  # Lowest merged pivot price
+    high: float  # Highest merged pivot price
+    touches: int  # Number of pivots merged into the zone
+    strength: float  # Touches weighted by how recent they are
+    first_index: int  # Candle index of the oldest touch
+    last_index: int  # Candle index of the newest touch
+
+
+def tick_size(symbol_info) -> float:
+    """
+    Reads the price tick size from client.get_symbol_info(), None if the symbol has no price filter.
+    """
+    for symbol_filter in (symbol_info or {}).get('filters', []):
+        if symbol_filter.get('filterType') == 'PRICE_FILTER':
+            return float(symbol_filter['tickSize'])
+    return None
+
+
+def cluster_levels(pivot_list, percent=0.5, tick_size=None, ticks=None, candle_count=None) -> list:
+    """
+    Merges support or resistance pivots that are only a few ticks apart into ranked zones.
+    A zone grows from its lowest price and takes every pivot within percent % of it, or within
+    ticks * tick_size when both are given.
+    The strength of a zone is the sum of its touches, where the newest candle counts 1 and the oldest 0.5.
+    :param pivot_list: (candle index, price) tuples, e.g. support_list or resistance_list
+    :param percent: Zone width as a percentage of the price
+    :param tick_size: Symbol's price tick size, see tick_size()
+    :param ticks: Zone width in ticks, used instead of percent together with tick_size
+    :param candle_count: Number of candles the pivots come from, defaults to the newest pivot index + 1
+    :return: Level objects, strongest first
+    """
+    if not pivot_list:
+        return []
+    index = np.fromiter((candle for candle, _ in pivot_list), dtype=np.int64, count=len(pivot_list))
+    prices = np.fromiter((price for _, price in pivot_list), dtype=np.float64, count=len(pivot_list))
+    if candle_count is None:
+        candle_count = int(index.max()) + 1
+    weights = 0.5 + 0.5 * index / max(candle_count - 1, 1)
+
+    order = np.argsort(prices, kind='stable')
+    index, prices, weights = index[order], prices[order], weights[order]
+    use_ticks = tick_size is not None and ticks is not None
+    levels, start = [], 0
+    for end in range(1, len(prices) + 1):
+        if end < len(prices):
+            width = ticks * tick_size if use_ticks else prices[start] * percent / 100
+            if prices[end] - prices[start] <= width:
+                continue
+        zone = slice(start, end)
+        mean = prices[zone].mean()
+        if tick_size:
+            price = round(round(mean / tick_size) * tick_size, 12)
+        else:
+            price = prices[zone][np.abs(prices[zone] - mean).argmin()]  # Closest real pivot, no float noise
+        levels.append(Level(price=price, low=prices[start], high=prices[end - 1], touches=end - start,
+                            strength=float(weights[zone].sum()), first_index=int(index[zone].min()),
+                            last_index=int(index[zone].max())))
+        start = end
+    levels.sort(key=lambda level: level.strength, reverse=True)
+    return levels
+
+
+def merged_pivots(pivot_list, **kwargs) -> list:
+    """
+    Clusters pivot_list and returns one (first touch index, price) tuple per zone, ordered by their newest
+    touch like the pivots themselves, so the result can stand in for support_list or resistance_list.
+    """
+    levels = cluster_levels(pivot_list, **kwargs)
+    return [(level.first_index, level.price) for level in sorted(levels, key=lambda level: level.last_index)]
@@ -2,16 +2,10 @@ import os
 import time
 from dataclasses import dataclass, field
 import pandas as pd
-import pandas_ta.momentum as ta
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import yfinance as yf
-from binance.client import Client
-from stock_ticker import StockTicker
 import streamlit as st
+import pivots
+import supres
 from typing import Dict
-from dateutil.relativedelta import relativedelta
-from datetime import datetime, timedelta
 
 @dataclass
 class Values:
@@ -39,219 +33,72 @@ class Supres(Values):
 		Supres._main(ticker, df, selected_timeframe=selected_timeframe, candle_count=candle_count)
 
 	@staticmethod
-	def main(ticker, selected_timeframe='1d', candle_count=254, sma_windows={}):
-		stockticker = StockTicker(database_url='duckdb:///main_supres/codes.ddb', read_only=True)
+	def main_from_frame(ticker, df, selected_timeframe='1d', candle_count=254):
+		"""
+		Analyzes a frame built by klines.kline_frame (oldest candle first) without going through a CSV file.
+		"""
+		df = df.tail(candle_count).reset_index(drop=True)
+		df = pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
+
+		Supres._main(ticker, df, selected_timeframe=selected_timeframe, candle_count=candle_count)
+
+	@staticmethod
+	def main(ticker, selected_timeframe='1d', candle_count=254, sma_windows={}, sens=2, before_candle_count=3,
+			 level_percent=0, ribbon_windows=(), ribbon_kind='sma'):
+		from stock_ticker import StockTicker
+		from yahoo_data import YahooData
+
+		stockticker = StockTicker(database_url='duckdb:///main_supres/codes.ddb', read_only=True, indexed=True)
 		normal_ticker = stockticker.normalize(ticker, yahoo=False)
 		yahoo_ticker = stockticker.normalize(ticker, yahoo=True)
 		if normal_ticker != yahoo_ticker:
 			ticker = stockticker.get_name(normal_ticker)
 
-		start = None
-		limits = {'1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '60m': 730, '90m': 60, '1h': 730, '1d': None, '5d': None, '1wk': None, '1mo': None, '3mo': None,}
-		limit = limits.get(selected_timeframe)
-		# st.write(f"selected_timeframe: {selected_timeframe}")
-		if limit is not None:
-			start = datetime.today() - relativedelta(days=limit-1)
-			# st.write(start)
-		# df = yf.download(yahoo_ticker, start=start, interval=selected_timeframe)[-candle_count:]
-		yfticker = yf.Ticker(yahoo_ticker)
-		st.write(f"### {yfticker.info.get('shortName')}")
-		df = yfticker.history(start=start, interval=selected_timeframe, period='max')[-candle_count:]
+		yahoo = YahooData()
+		info = yahoo.info(yahoo_ticker)
+		st.write(f"### {info.get('shortName')}")
+		df = yahoo.history(yahoo_ticker, interval=selected_timeframe, candle_count=candle_count)
 
 		if len(df) < candle_count:
 			st.warning(f"**{ticker}** does not have enought candles to display ({len(df)})")
 			st.write(df)
 			return
 
-		df.index.name = 'Date'
-		df.reset_index(inplace=True)
-		df.columns = [x.lower() for x in df.columns]
 		df = pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
 		df.dropna(inplace=True)
+		latest = df.iloc[-1]
+		grid = level_grid(yahoo_ticker, selected_timeframe, candle_count,
+						  (int(latest['unix']), latest['open'], latest['high'], latest['low'], latest['close']), df)
 
-		Supres._main(ticker, df, selected_timeframe=selected_timeframe, candle_count=candle_count)
-		st.write(f"{yfticker.info['longBusinessSummary']}")
+		Supres._main(ticker, df, selected_timeframe=selected_timeframe, candle_count=candle_count,
+					 sma_windows=sma_windows, sens=sens, before_candle_count=before_candle_count,
+					 level_percent=level_percent, ribbon_windows=ribbon_windows, ribbon_kind=ribbon_kind, grid=grid)
+		st.write(f"{info.get('longBusinessSummary', '')}")
 
 	@staticmethod
-	def _main(ticker, df, selected_timeframe='1D', candle_count=254):
-		if True:
-			historical_hightimeframe = (Client.KLINE_INTERVAL_1DAY,
-										Client.KLINE_INTERVAL_3DAY)
-			historical_lowtimeframe = (Client.KLINE_INTERVAL_1MINUTE,
-									   Client.KLINE_INTERVAL_3MINUTE,
-									   Client.KLINE_INTERVAL_5MINUTE,
-									   Client.KLINE_INTERVAL_15MINUTE,
-									   Client.KLINE_INTERVAL_30MINUTE,
-									   Client.KLINE_INTERVAL_1HOUR,
-									   Client.KLINE_INTERVAL_2HOUR,
-									   Client.KLINE_INTERVAL_4HOUR,
-									   Client.KLINE_INTERVAL_6HOUR,
-									   Client.KLINE_INTERVAL_8HOUR,
-									   Client.KLINE_INTERVAL_12HOUR)
-		else:
-			historical_hightimeframe = ('1d', '3d')
-			historical_lowtimeframe = ('1m', '3m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h')
-
-		# Sma, Rsi, Macd, Fibonacci variables
-		def indicators(sma1_window=20, sma2_window=50, sma3_window=100) -> tuple:  # [tuple, tuple, tuple, tuple]:
-			"""
-			Takes in three integer arguments, and returns a dataframe with three columns,
-			each containing the moving average of the closing price for the given length.
-			:param sma1_window: The length of the first moving average, defaults to 20 (optional)
-			:param sma2_window: The length of the second moving average, defaults to 50 (optional)
-			:param sma3_window: The length of the third moving average, defaults to 100 (optional)
-			"""
-			dfsma = df[:-1]
-			sma_1 = tuple((dfsma.ta.sma(sma1_window)))
-			sma_2 = tuple((dfsma.ta.sma(sma2_window)))
-			sma_3 = tuple((dfsma.ta.sma(sma3_window)))
-			rsi_tuple = tuple((ta.rsi(df['close'][:-1])))
-			return {f'SMA{sma1_window}': sma_1, f'SMA{sma2_window}': sma_2, f'SMA{sma3_window}': sma_3, 'RSI': rsi_tuple}
-
-		inds = indicators(**sma_windows)
+	def _main(ticker, df, selected_timeframe='1D', candle_count=254, sma_windows={}, sens=2, before_candle_count=3,
+			  level_percent=0, ribbon_windows=(), ribbon_kind='sma', grid=None):
+		import plotly.graph_objects as go
+		from plotly.subplots import make_subplots
+
+		historical_hightimeframe = ('1d', '3d')
+		historical_lowtimeframe = ('1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h')
+
+		# Levels, Sma, Rsi, Fibonacci and candlestick pattern variables
+		result = supres.analyze(df, sens=sens, before_candle_count=before_candle_count, sma_windows=sma_windows,
+								level_percent=level_percent, patterns=selected_timeframe in historical_hightimeframe,
+								ribbon_windows=ribbon_windows, ribbon_kind=ribbon_kind, grid=grid)
+		inds = result.indicators
 		sma1, sma2, sma3, rsi = inds.values()
-
-		support_list, resistance_list, fibonacci_uptrend, fibonacci_downtrend, pattern_list = [], [], [], [], []
-		support_above, support_below, resistance_below, resistance_above, x_date = [], [], [], [], ''
-		fibonacci_multipliers = 0.236, 0.382, 0.500, 0.618, 0.705, 0.786, 0.886
+		support_list, resistance_list, pattern_list = result.support_list, result.resistance_list, result.pattern_list
+		fibonacci_uptrend, fibonacci_downtrend = result.fibonacci_uptrend, result.fibonacci_downtrend
+		fibonacci_multipliers, x_date = result.fibonacci_multipliers, ''
 		# Chart settings
 		legend_color, chart_color, background_color, support_line_color, resistance_line_color = \
 			"#D8D8D8", "#E7E7E7", "#E7E7E7", "LightSeaGreen", "MediumPurple"
 		fig = make_subplots(rows=3, cols=1, shared_xaxes=True,
 							vertical_spacing=0, row_width=[0.1, 0.1, 0.8])
 
-		def support(candle_value, candle_index, before_candle_count, after_candle_count):  # -> (bool | None):
-			"""
-			If the price of the asset is increasing for the last before_candle_count and decreasing for
-			the last after_candle_count, then return True. Otherwise, return False.
-			"""
-			try:
-				for current_value in range(candle_index - before_candle_count + 1, candle_index + 1):
-					if candle_value.low[current_value] > candle_value.low[current_value - 1]:
-						return False
-				for current_value in range(candle_index + 1, candle_index + after_candle_count + 1):
-					if candle_value.low[current_value] < candle_value.low[current_value - 1]:
-						return False
-				return True
-			except KeyError:
-				pass
-
-		def resistance(candle_value, candle_index, before_candle_count, after_candle_count):  # -> (bool | None):
-			"""
-			If the price of the stock is increasing for the last before_candle_count and decreasing for the last
-			after_candle_count, then return True. Otherwise, return False.
-			"""
-			try:
-				for current_value in range(candle_index - before_candle_count + 1, candle_index + 1):
-					if candle_value.high[current_value] < candle_value.high[current_value - 1]:
-						return False
-				for current_value in range(candle_index + 1, candle_index + after_candle_count + 1):
-					if candle_value.high[current_value] > candle_value.high[current_value - 1]:
-						return False
-				return True
-			except KeyError:
-				pass
-
-		def fibonacci_pricelevels(high_price, low_price):  # -> tuple[list, list]:
-			"""
-			Uptrend Fibonacci Retracement Formula =>
-			Fibonacci Price Level = High Price - (High Price - Low Price)*Fibonacci Level
-			:param high_price: High price for the period
-			:param low_price: Low price for the period
-			"""
-			for multiplier in fibonacci_multipliers:
-				retracement_levels_uptrend = low_price + (high_price - low_price) * multiplier
-				fibonacci_uptrend.append(retracement_levels_uptrend)
-				retracement_levels_downtrend = high_price - (high_price - low_price) * multiplier
-				fibonacci_downtrend.append(retracement_levels_downtrend)
-			return fibonacci_uptrend, fibonacci_downtrend
-
-		def candlestick_patterns() -> list:
-			"""
-			Takes in a dataframe and returns a list of candlestick patterns found in the dataframe then returns
-			pattern list.
-			"""
-			from candlestick import candlestick
-			nonlocal df
-			df = candlestick.inverted_hammer(df, target='inverted_hammer')
-			df = candlestick.hammer(df, target='hammer')
-			df = candlestick.doji(df, target='doji')
-			df = candlestick.bearish_harami(df, target='bearish_harami')
-			df = candlestick.bearish_engulfing(df, target='bearish_engulfing')
-			df = candlestick.bullish_harami(df, target='bullish_harami')
-			df = candlestick.bullish_engulfing(df, target='bullish_engulfing')
-			df = candlestick.dark_cloud_cover(df, target='dark_cloud_cover')
-			df = candlestick.dragonfly_doji(df, target='dragonfly_doji')
-			df = candlestick.hanging_man(df, target='hanging_man')
-			df = candlestick.gravestone_doji(df, target='gravestone_doji')
-			df = candlestick.morning_star(df, target='morning_star')
-			df = candlestick.morning_star_doji(df, target='morning_star_doji')
-			df = candlestick.piercing_pattern(df, target='piercing_pattern')
-			df = candlestick.star(df, target='star')
-			df = candlestick.shooting_star(df, target='shooting_star')
-			df.replace({True: 'pattern_found'}, inplace=True)  # Dodge boolean 'True' output
-
-			def pattern_find_func(pattern_row) -> list:
-				"""
-				The function takes in a dataframe and a list of column names. It then iterates through the
-				list of column names and checks if the column name is in the dataframe. If it is, it adds
-				the column name to a list and adds the date of the match to another list.
-				"""
-				t = 0
-				pattern_find = [col for col in df.columns]
-				for pattern in pattern_row:
-					if pattern == 'pattern_found':
-						# pattern, date
-						pattern_list.append((pattern_find[t], pattern_row['date'].strftime('%b-%d-%y')))
-					t += 1
-				return pattern_list
-
-			# Loop through the dataframe and find the pattern in the dataframe
-			for item in range(-3, -30, -1):
-				pattern_find_func(df.iloc[item])
-			return pattern_list
-
-		def sensitivity(sens=2):  # -> tuple[list, list]:
-			"""
-			Find the support and resistance levels for a given asset.
-			sensitivity:1 is recommended for daily charts or high frequency trade scalping.
-			:param sens: sensitivity parameter default:2, level of detail 1-2-3 can be given to function
-			"""
-			for sens_row in range(3, len(df) - 1):
-				if support(df, sens_row, 3, sens):
-					support_list.append((sens_row, df.low[sens_row]))
-				if resistance(df, sens_row, 3, sens):
-					resistance_list.append((sens_row, df.high[sens_row]))
-			return support_list, resistance_list
-
-		def chart_lines():
-			"""
-			Check if the support and resistance lines are above or below the latest close price.
-			"""
-			# Find support and resistance levels
-			# Check if the support is below the latest close. If it is, it is appending it to the list
-			# support_below. If it isn't, it is appending it to the list resistance_below.
-			all_support_list = tuple(map(lambda sup1: sup1[1], support_list))
-			all_resistance_list = tuple(map(lambda res1: res1[1], resistance_list))
-			latest_close = df['close'].iloc[-1]
-			for support_line in all_support_list:  # Find closes
-				if support_line < latest_close:
-					support_below.append(support_line)
-				else:
-					resistance_below.append(support_line)
-			if len(support_below) == 0:
-				support_below.append(df.low.min())
-			# Check if the price is above the latest close price. If it is, it is appending it to the
-			# resistance_above list. If it is not, it is appending it to the support_above list.
-			for resistance_line in all_resistance_list:
-				if resistance_line > latest_close:
-					resistance_above.append(resistance_line)
-				else:
-					support_above.append(resistance_line)
-			if len(resistance_above) == 0:
-				resistance_above.append(df.high.max())
-			return fibonacci_pricelevels(resistance_above[-1], support_below[-1])
-
 		def legend_candle_patterns() -> None:
 			"""
 			The function takes the list of candlestick patterns and adds them to the chart as a legend text.
@@ -295,39 +142,16 @@ class Supres(Values):
 			fig.add_hline(y=70, name="RSI higher band", line=dict(color='red', width=1), line_dash='dash', row=3, col=1)
 			fig.add_hrect(y0=30, y1=70, line_width=0, fillcolor="gray", opacity=0.2, row=3, col=1)
 
-		def draw_support() -> None:
-			"""
-			Draws the support lines and adds annotations to the chart.
-			"""
-			c = 0
-			while True:
-				if c > len(support_list) - 1:
-					break
-				# Support lines
-				fig.add_shape(type='line', x0=support_list[c][0] - 1, y0=support_list[c][1],
-							  x1=len(df) + 25,
-							  y1=support_list[c][1], line=dict(color=support_line_color, width=2))
-				# Support annotations
-				fig.add_annotation(x=len(df) + 7, y=support_list[c][1], text=str(support_list[c][1]),
-								   font=dict(size=15, color=support_line_color))
-				c += 1
-
-		def draw_resistance() -> None:
+		def draw_levels() -> None:
 			"""
-			Draws the resistance lines and adds annotations to the chart.
+			Draws the support and resistance lines with their annotations in one layout update.
 			"""
-			c = 0
-			while True:
-				if c > len(resistance_list) - 1:
-					break
-				# Resistance lines
-				fig.add_shape(type='line', x0=resistance_list[c][0] - 1, y0=resistance_list[c][1],
-							  x1=len(df) + 25,
-							  y1=resistance_list[c][1], line=dict(color=resistance_line_color, width=1))
-				# Resistance annotations
-				fig.add_annotation(x=len(df) + 20, y=resistance_list[c][1], text=str(resistance_list[c][1]),
-								   font=dict(size=15, color=resistance_line_color))
-				c += 1
+			support_shapes, support_annotations = supres.level_shapes(
+				support_list, x_end=len(df) + 25, label_x=len(df) + 7, color=support_line_color, width=2)
+			resistance_shapes, resistance_annotations = supres.level_shapes(
+				resistance_list, x_end=len(df) + 25, label_x=len(df) + 20, color=resistance_line_color, width=1)
+			fig.update_layout(shapes=list(fig.layout.shapes) + support_shapes + resistance_shapes,
+							  annotations=list(fig.layout.annotations) + support_annotations + resistance_annotations)
 
 		def legend_texts() -> None:
 			"""
@@ -397,6 +221,12 @@ class Supres(Values):
 				fig.add_trace(go.Scatter(x=df['date'].dt.strftime(x_date), y=sma3,
 										 name=f"{sma3_name}     : {float(sma3[-1]):.{str_price_len}f}",
 										 line=dict(color='#a69b05', width=3)))
+				# Moving average ribbon, shorter windows in lighter colors
+				for row, window in enumerate(result.ribbon_windows):
+					shade = int(200 - 150 * row / max(len(result.ribbon_windows) - 1, 1))
+					fig.add_trace(go.Scatter(x=df['date'][:-1].dt.strftime(x_date), y=result.ribbon[row],
+											 name=f"{ribbon_kind.upper()}{window}", showlegend=False,
+											 line=dict(color=f'rgb({shade}, {shade}, 255)', width=1)))
 				fig.add_trace(go.Scatter(
 					y=[support_list[0]], name=f"-- Fibonacci Uptrend | Downtrend --", mode="markers",
 					marker=dict(color=legend_color, size=0)))
@@ -500,21 +330,16 @@ class Supres(Values):
 				pine.writelines(lines_sma + lines)
 			return lines
 
-		sensitivity()
-		chart_lines()
 		# Checking if the selected timeframe is in the historical_hightimeframe list.
 		if selected_timeframe in historical_hightimeframe:
-			candlestick_patterns()
 			x_date = '%b-%d-%y'
 		elif selected_timeframe in historical_lowtimeframe:
 			x_date = '%H:%M %d-%b'
 		create_candlestick_plot()
 		add_volume_subplot()
 		add_rsi_subplot()
-		float_resistance_above = list(map(float, sorted(resistance_above + resistance_below)))
-		float_support_below = list(map(float, sorted(support_below + support_above, reverse=True)))
-		draw_support()
-		draw_resistance()
+		float_resistance_above, float_support_below = result.float_resistance_above, result.float_support_below
+		draw_levels()
 		legend_texts()
 		chart_updates()
 		# save()
@@ -526,42 +351,56 @@ class Supres(Values):
 		st.plotly_chart(fig, use_container_width=True)
 
 
-def action(ticker, selected_timeframe='1d', sma_windows={}, candle_count=254):
+def action(ticker, selected_timeframe='1d', sma_windows={}, candle_count=254, sens=2, before_candle_count=3,
+		   level_percent=0, ribbon_windows=(), ribbon_kind='sma'):
 	if False:
 		import historical_data
 
 		os.chdir("../main_supres")  # Change the directory to the main_supres folder
-		file_name = historical_data.file_name
 		ticker = historical_data.ticker
 		try:
 			perf = time.perf_counter()
-			historical_data.historical_data_write(ticker)
-			if os.path.isfile(file_name):  # Check .csv file is there or not
-				print(f"{file_name} downloaded and created.")
-				Supres.main_from_csv(file_name, historical_data.time_frame)
-				print("Data analysis is done. Browser opening.")
-				# remove the .csv file
-				os.remove(file_name)
-				print(f"{file_name} file deleted.")
-			else:
-				raise print("One or more issues caused the download to fail. "
-							"Make sure you typed the filename correctly.")
-
+			df = historical_data.historical_data_frame(ticker)
+			print(f"{ticker} {len(df)} candles downloaded.")
+			Supres.main_from_frame(ticker, df, historical_data.time_frame)
+			print("Data analysis is done. Browser opening.")
 		except KeyError:
-			os.remove(file_name)
 			raise KeyError("Key error, algorithm issue")
 
 	else:
 		perf = time.perf_counter()
-		Supres.main(ticker, selected_timeframe=selected_timeframe, sma_windows=sma_windows, candle_count=candle_count)
+		Supres.main(ticker, selected_timeframe=selected_timeframe, sma_windows=sma_windows, candle_count=candle_count,
+					sens=sens, before_candle_count=before_candle_count, level_percent=level_percent,
+					ribbon_windows=ribbon_windows, ribbon_kind=ribbon_kind)
+
 
+@st.cache_data(max_entries=32)
+def level_grid(ticker, selected_timeframe, candle_count, latest_candle, _df) -> pivots.SensitivityGrid:
+	"""
+	Pivots of the shown candles for every position of the level sliders, cached by ticker, timeframe, candle
+	count and the latest candle (_df is not hashed), so moving a slider only picks an entry of the grid.
+	:param latest_candle: (unix, open, high, low, close) of the latest candle, it is still open and its prices
+	change between reruns
+	"""
+	return pivots.sensitivity_grid(_df['low'], _df['high'])
 
-@st.cache
 def get_listing(market: str) -> pd.DataFrame:
+	"""
+	Listing of a market, StockTicker keeps it for the process and reloads it when codes.ddb changes.
+	"""
+	from stock_ticker import StockTicker
+
 	s = StockTicker(database_url='duckdb:///main_supres/codes.ddb', read_only=True)
-	df = s.get_listing(market)
-	df = df.dropna()
-	return df
+	return s.get_listing(market)
+
+def search_tickers(query: str) -> list:
+	"""
+	Ranked ticker matches of a name or code prefix, the search index is built once per process.
+	"""
+	from stock_ticker import StockTicker
+
+	s = StockTicker(database_url='duckdb:///main_supres/codes.ddb', read_only=True, indexed=True)
+	return s.search(query)
 
 if __name__ == "__main__":
 	st.set_page_config(layout="wide")
@@ -575,7 +414,11 @@ if __name__ == "__main__":
 		kind = st.radio('Select search type', ['by Name', 'by Ticker', 'from List'], index=2)
 		ticker = None
 		if kind == 'by Name':
-			ticker = st.text_input('Stock Name:', '')
+			matches = search_tickers(st.text_input('Stock Name:', ''))
+			if len(matches) > 0:
+				code_name = st.selectbox('Matches:', [f"{row.short_code} ({row.name})" if row.name else row.short_code
+				                                      for row in matches])
+				ticker = code_name.split(' ')[0]
 		elif kind == 'by Ticker':
 			ticker = st.text_input('Stock Ticker:', '')
 		elif kind == 'from List':
@@ -599,6 +442,15 @@ if __name__ == "__main__":
 		ma_length2 = st.number_input('SMA2 Window', min_value=5, value=50)
 		ma_length3 = st.number_input('SMA3 Window', min_value=5, value=100)
 		sma_windows = {'sma1_window': ma_length1, 'sma2_window': ma_length2, 'sma3_window': ma_length3}
+		ribbon_windows = st.multiselect('Ribbon Windows', list(range(5, 205, 5)), default=[])
+		ribbon_kind = st.radio('Ribbon Average', ['sma', 'ema'], index=0)
+
+		st.write("## Level Settings")
+		sens = st.slider('Sensitivity (candles after pivot)', min_value=1, max_value=5, value=2)
+		before_candle_count = st.slider('Look-back (candles before pivot)', min_value=1, max_value=5, value=3)
+		level_percent = st.number_input('Merge levels within (%)', min_value=0.0, max_value=10.0, value=0.0, step=0.1)
 
 	if kind == 'from List' or st.sidebar.button('Go'):
-		action(ticker, selected_timeframe=selected_timeframe, sma_windows=sma_windows, candle_count=candle_count)
\ No newline at end of file
+		action(ticker, selected_timeframe=selected_timeframe, sma_windows=sma_windows, candle_count=candle_count,
+			   sens=sens, before_candle_count=before_candle_count, level_percent=level_percent,
+			   ribbon_windows=ribbon_windows, ribbon_kind=ribbon_kind)
\ No newline at end of file
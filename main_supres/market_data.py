@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import pandas as pd
+from fetch_scheduler import to_milliseconds
+from frameselect import interval_ms, open_time
+
+# live talks to Binance / Yahoo, record does the same and saves every answer, replay serves the saved answers
+mode_variable, directory_variable, latency_variable = \
+    'SUPRES_MARKET_DATA', 'SUPRES_MARKET_DATA_DIR', 'SUPRES_MARKET_DATA_LATENCY'
+default_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_data")
+recorded_methods = ('get_symbol_info', 'get_all_tickers', 'get_server_time', 'get_exchange_info')
+kline_methods = ('get_historical_klines', 'get_klines')
+
+
+def call_file(directory, method, args, kwargs) -> str:
+    key = json.dumps([args, sorted(kwargs.items())], default=str)
+    return os.path.join(directory, f"{method}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.json")
+
+
+def klines_file(directory, symbol, interval) -> str:
+    return os.path.join(directory, f"klines-{symbol}-{interval}.json")
+
+
+def kline_arguments(method, args, kwargs) -> tuple:
+    """
+    (symbol, interval, start in ms) of a get_historical_klines or get_klines call.
+    """
+    names = ('symbol', 'interval', 'start_str' if method == 'get_historical_klines' else 'start_time')
+    values = dict(zip(names, args), **kwargs)
+    start = values.get('start_str', values.get('start_time', values.get('startTime')))
+    return values['symbol'], values['interval'], 0 if start is None else to_milliseconds(start)
+
+
+class RecordingClient:
+    """
+    Wraps a binance Client (or a fetch_scheduler.KlineFetcher) and saves what it answers into directory.
+    Klines are merged into one file per symbol and interval, other calls get one file per argument set.
+    """
+    def __init__(self, client, directory=default_directory):
+        self.client, self.directory = client, directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def __getattr__(self, method):
+        attribute = getattr(self.client, method)
+        if method not in recorded_methods + kline_methods:
+            return attribute
+
+        def recorded(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            with self.lock:
+                if method in kline_methods:
+                    self._merge_klines(*kline_arguments(method, args, kwargs)[:2], result)
+                else:
+                    with open(call_file(self.directory, method, args, kwargs), 'w') as f:
+                        json.dump(result, f)
+            return result
+        return recorded
+
+    def _merge_klines(self, symbol, interval, klines):
+        file_name = klines_file(self.directory, symbol, interval)
+        stored = {}
+        if os.path.isfile(file_name):
+            with open(file_name) as f:
+                stored = {kline[0]: kline for kline in json.load(f)['klines']}
+        stored.update((kline[0], kline) for kline in klines)
+        with open(file_name, 'w') as f:
+            json.dump({'recorded_at': int(time.time() * 1000), 'klines': sorted(stored.values())}, f)
+
+
+class ReplayClient:
+    """
+    Serves recordings of RecordingClient without any network, waiting latency seconds per call.
+    Entry points ask for klines starting some candles before now, so kline start times are moved back by the
+    candles passed since the recording and the same candles come back on every run.
+    """
+    def __init__(self, directory=default_directory, latency=0.0, clock=time.time):
+        self.directory, self.latency, self.clock = directory, latency, clock
+        self.klines = {}
+        self.lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _call(self, method, *args, **kwargs):
+        self._wait()
+        file_name = call_file(self.directory, method, args, kwargs)
+        if not os.path.isfile(file_name):
+            raise KeyError(f"No recording of {method}{args} {kwargs} in {self.directory}")
+        with open(file_name) as f:
+            return json.load(f)
+
+    def get_symbol_info(self, *args, **kwargs):
+        return self._call('get_symbol_info', *args, **kwargs)
+
+    def get_all_tickers(self, *args, **kwargs):
+        return self._call('get_all_tickers', *args, **kwargs)
+
+    def get_server_time(self, *args, **kwargs):
+        return self._call('get_server_time', *args, **kwargs)
+
+    def get_exchange_info(self, *args, **kwargs):
+        return self._call('get_exchange_info', *args, **kwargs)
+
+    def _recorded_klines(self, symbol, interval) -> dict:
+        with self.lock:
+            if (symbol, interval) not in self.klines:
+                file_name = klines_file(self.directory, symbol, interval)
+                if not os.path.isfile(file_name):
+                    raise KeyError(f"No recorded {symbol} {interval} klines in {self.directory}")
+                with open(file_name) as f:
+                    self.klines[symbol, interval] = json.load(f)
+            return self.klines[symbol, interval]
+
+    @staticmethod
+    def _shift(interval, now, recorded_at) -> int:
+        """
+        Whole candles passed since the recording, in ms, so the window does not depend on how far into the
+        current candle the replay runs. Intervals without a fixed length (1M) move by the raw time passed.
+        """
+        if interval not in interval_ms:
+            return now - recorded_at
+        return open_time(interval, now) - open_time(interval, recorded_at)
+
+    def get_historical_klines(self, *args, **kwargs) -> list:
+        self._wait()
+        symbol, interval, start = kline_arguments('get_historical_klines', args, kwargs)
+        recording = self._recorded_klines(symbol, interval)
+        start -= max(self._shift(interval, int(self.clock() * 1000), recording['recorded_at']), 0)
+        return [kline for kline in recording['klines'] if kline[0] >= start]
+
+    def get_klines(self, *args, **kwargs) -> list:
+        limit = kwargs.pop('limit', 500)
+        return self.get_historical_klines(*args, **kwargs)[:limit]
+
+
+class RecordingTicker:
+    """
+    Wraps a yfinance Ticker and saves history() frames and info. History frames are merged into one file per
+    interval by date, the latest answer wins for a date asked for twice.
+    """
+    def __init__(self, ticker, directory=default_directory):
+        self.ticker, self.directory = ticker, directory
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def info(self) -> dict:
+        info = self.ticker.info
+        with open(os.path.join(self.directory, f"info-{self.ticker.ticker}.json"), 'w') as f:
+            json.dump(info, f, default=str)
+        return info
+
+    def history(self, interval='1d', **kwargs) -> pd.DataFrame:
+        df = self.ticker.history(interval=interval, **kwargs)
+        self._merge_history(interval, df)
+        return df
+
+    def _merge_history(self, interval, df):
+        file_name = os.path.join(self.directory, f"history-{self.ticker.ticker}-{interval}.pkl")
+        merged = df
+        if os.path.isfile(file_name):
+            merged = pd.concat([pd.read_pickle(file_name), df])
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        merged.to_pickle(file_name)
+
+
+class ReplayTicker:
+    """
+    Serves RecordingTicker recordings, history() returns the recorded frame of the interval from start on.
+    """
+    def __init__(self, symbol, directory=default_directory, latency=0.0):
+        self.ticker, self.directory, self.latency = symbol, directory, latency
+
+    def _file(self, file_name) -> str:
+        time.sleep(self.latency)
+        file_name = os.path.join(self.directory, file_name)
+        if not os.path.isfile(file_name):
+            raise KeyError(f"No recording {file_name}")
+        return file_name
+
+    @property
+    def info(self) -> dict:
+        with open(self._file(f"info-{self.ticker}.json")) as f:
+            return json.load(f)
+
+    def history(self, interval='1d', start=None, **kwargs) -> pd.DataFrame:
+        df = pd.read_pickle(self._file(f"history-{self.ticker}-{interval}.pkl"))
+        if start is None:
+            return df
+        index = pd.DatetimeIndex(df.index)
+        if index.tz is not None:  # yfinance compares start with the exchange's local dates
+            index = index.tz_localize(None)
+        return df[index >= pd.Timestamp(start)]
+
+
+def settings(mode=None, directory=None, latency=None) -> tuple:
+    """
+    Fills in mode, directory and latency from the SUPRES_MARKET_DATA* environment variables.
+    """
+    mode = mode or os.environ.get(mode_variable, 'live')
+    if mode not in ('live', 'record', 'replay'):
+        raise ValueError(f"Unknown market data mode {mode}, use live, record or replay")
+    directory = directory or os.environ.get(directory_variable, default_directory)
+    latency = float(os.environ.get(latency_variable, 0) if latency is None else latency)
+    return mode, directory, latency
+
+
+def binance_client(factory=None, mode=None, directory=None, latency=None):
+    """
+    Returns the Binance market data provider for the configured mode.
+    :param factory: Creates the live client, defaults to binance Client("", ""), not called when replaying
+    """
+    mode, directory, latency = settings(mode, directory, latency)
+    if mode == 'replay':
+        return ReplayClient(directory, latency=latency)
+    if factory is None:
+        from binance.client import Client
+
+        def factory():
+            return Client("", "")
+    return factory() if mode == 'live' else RecordingClient(factory(), directory)
+
+
+def yahoo_ticker(symbol, mode=None, directory=None, latency=None):
+    """
+    Returns a yfinance Ticker, or its recording / replay stand-in, for the configured mode.
+    """
+    mode, directory, latency = settings(mode, directory, latency)
+    if mode == 'replay':
+        return ReplayTicker(symbol, directory, latency=latency)
+    import yfinance as yf
+    ticker = yf.Ticker(symbol)
+    return ticker if mode == 'live' else RecordingTicker(ticker, directory)
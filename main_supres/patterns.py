@@ -0,0 +1,69 @@
+import numpy as np
+
+# Pattern name -> number of candles it looks at, in the order the legend lists them
+pattern_candles = {'inverted_hammer': 1, 'hammer': 1, 'doji': 1, 'bearish_harami': 2, 'bearish_engulfing': 2,
+                   'bullish_harami': 2, 'bullish_engulfing': 2, 'dark_cloud_cover': 2, 'dragonfly_doji': 1,
+                   'hanging_man': 3, 'gravestone_doji': 1, 'morning_star': 3, 'morning_star_doji': 3,
+                   'piercing_pattern': 2, 'star': 2, 'shooting_star': 2}
+
+
+def pattern_masks(o, h, l, c, po, ph, pl, pc, bo, bh, bl, bc) -> dict:
+    """
+    Evaluates every pattern of the candlestick package at once. o, h, l, c are the candles being checked,
+    po.. the previous candles and bo.. the ones before those, all arrays of the same length.
+    :return: Pattern name -> boolean array
+    """
+    body, prev_body, b_prev_body = np.abs(c - o), np.abs(pc - po), np.abs(bc - bo)
+    top, bottom, prev_top, prev_bottom = np.maximum(c, o), np.minimum(c, o), np.maximum(pc, po), np.minimum(pc, po)
+    body_ratio, prev_body_ratio, b_prev_body_ratio = body / (h - l), prev_body / (ph - pl), b_prev_body / (bh - bl)
+    candle_range = .001 + h - l
+    return {
+        'inverted_hammer': ((h - l) > 3 * (o - c)) & ((h - c) / candle_range > 0.6) & ((h - o) / candle_range > 0.6),
+        'hammer': ((h - l) > 3 * (o - c)) & ((c - l) / candle_range > 0.6) & ((o - l) / candle_range > 0.6),
+        'doji': (body_ratio < 0.1) & ((h - top) > 3 * body) & ((bottom - l) > 3 * body),
+        'bearish_harami': (pc > po) & (po <= c) & (c < o) & (o <= pc) & (o - c < pc - po),
+        'bearish_engulfing': (o >= pc) & (pc > po) & (o > c) & (po >= c) & (o - c > pc - po),
+        'bullish_harami': (po > pc) & (pc <= o) & (o < c) & (c <= po) & (c - o < po - pc),
+        'bullish_engulfing': (c >= po) & (po > pc) & (c > o) & (pc >= o) & (c - o > po - pc),
+        'dark_cloud_cover': (pc > po) & (prev_body_ratio >= 0.7) & (c < o) & (body_ratio >= 0.7) & (o > pc) &
+                            (c > po) & (c < (po + pc) / 2),
+        'dragonfly_doji': (body_ratio < 0.1) & ((bottom - l) > 3 * body) & ((h - top) < body),
+        'hanging_man': ((h - l) > 4 * (o - c)) & ((c - l) / candle_range >= 0.75) &
+                       ((o - l) / candle_range >= 0.75) & (ph < o) & (bh < o),
+        'gravestone_doji': (body_ratio < 0.1) & ((h - top) > 3 * body) & ((bottom - l) <= body),
+        'morning_star': (prev_top < bc) & (bc < bo) & (c > o) & (o > prev_top),
+        'morning_star_doji': (bc < bo) & (b_prev_body_ratio >= 0.7) & (prev_body_ratio < 0.1) & (c > o) &
+                             (body_ratio >= 0.7) & (bc > pc) & (bc > po) & (pc < o) & (po < o) & (c > bc) &
+                             ((ph - prev_top) > 3 * prev_body) & ((prev_bottom - pl) > 3 * prev_body),
+        'piercing_pattern': (pc < po) & (o < pl) & (po > c) & (c > pc + (po - pc) / 2),
+        'star': (pc > po) & (prev_body_ratio >= 0.7) & (body_ratio < 0.1) & (pc < c) & (pc < o),
+        'shooting_star': (po < pc) & (pc < o) & (h - top >= body * 3) & (bottom - l <= body),
+    }
+
+
+def find_patterns(open_price, high, low, close, dates, newest=-3, oldest=-29) -> list:
+    """
+    Looks for all candlestick patterns on the tail rows only, newest row first.
+    :param open_price: Open prices, oldest candle first
+    :param high: High prices
+    :param low: Low prices
+    :param close: Close prices
+    :param dates: Candle dates, returned as they are
+    :param newest: Newest row to report, as a negative position like df.iloc
+    :param oldest: Oldest row to report, as a negative position like df.iloc
+    :return: (pattern, date) records
+    """
+    ohlc = [np.asarray(prices, dtype=np.float64) for prices in (open_price, high, low, close)]
+    candle_count = len(ohlc[0])
+    rows = np.arange(candle_count + newest, max(candle_count + oldest, 0) - 1, -1)
+    rows = rows[rows >= 0]
+    if len(rows) == 0:
+        return []
+    shifted = [prices[np.maximum(rows - back, 0)] for back in (0, 1, 2) for prices in ohlc]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        masks = pattern_masks(*shifted)
+    found = np.stack([masks[pattern] & (rows >= candles - 1) for pattern, candles in pattern_candles.items()],
+                     axis=1)
+    names = list(pattern_candles)
+    dates = np.asarray(dates, dtype=object) if not isinstance(dates, np.ndarray) else dates
+    return [(names[pattern], dates[rows[row]]) for row, pattern in zip(*np.nonzero(found))]
@@ -0,0 +1,213 @@
+from dataclasses import dataclass
+import numpy as np
+
+
+def trend_runs(prices, rising=False) -> tuple:  # [np.ndarray, np.ndarray]:
+    """
+    For every candle, counts how many consecutive candles lead into it without breaking the trend and how
+    many candles after it keep moving the other way. A support candle needs lows that do not rise into it
+    and do not fall after it, a resistance candle (rising=True) needs the mirror image on the highs.
+    :param prices: Low prices for supports, high prices for resistances. 2-D input is one series per row.
+    :param rising: False for supports, True for resistances
+    :return: (before_runs, after_runs) integer arrays, one entry per candle
+    """
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    candle_count = prices.shape[-1]
+    index = np.arange(candle_count + 1)
+    previous, current = prices[..., :-1], prices[..., 1:]
+    # Comparisons against NaN are False, so missing values never break a run, the same as the old loops.
+    if rising:
+        broken_before, broken_after = current < previous, current > previous
+    else:
+        broken_before, broken_after = current > previous, current < previous
+
+    # The first candle has no previous candle to compare with, so every run going back stops there.
+    stop = np.ones(prices.shape, dtype=bool)
+    stop[..., 1:] = broken_before
+    last_stop = np.maximum.accumulate(np.where(stop, index[:-1], 0), axis=-1)
+    before_runs = index[:-1] - last_stop
+
+    # Past the last candle there is nothing to compare with, so every run going forward stops there.
+    stop = np.ones(prices.shape[:-1] + (candle_count + 1,), dtype=bool)
+    stop[..., 1:candle_count] = broken_after
+    next_stop = np.minimum.accumulate(np.where(stop, index, candle_count)[..., ::-1], axis=-1)[..., ::-1]
+    after_runs = next_stop[..., 1:] - index[1:]
+    return before_runs, after_runs
+
+
+def pivot_mask(prices, before_candle_count=3, after_candle_count=2, rising=False) -> np.ndarray:
+    """
+    Returns a boolean array that is True for every support (or resistance, rising=True) candle.
+    :param prices: Low prices for supports, high prices for resistances. 2-D input is one series per row.
+    :param before_candle_count: The number of candles before the pivot that must lead into it
+    :param after_candle_count: The number of candles after the pivot that must move away from it
+    :param rising: False for supports, True for resistances
+    """
+    before_runs, after_runs = trend_runs(prices, rising=rising)
+    mask = (before_runs >= before_candle_count) & (after_runs >= after_candle_count)
+    mask[..., mask.shape[-1] - 1:] = False  # The last row is never a pivot candidate
+    return mask
+
+
+def pivot_points(low, high, before_candle_count=3, after_candle_count=2) -> tuple:
+    """
+    Finds support and resistance pivots in one vectorized pass.
+    :param low: Low prices, oldest candle first
+    :param high: High prices, oldest candle first
+    :param before_candle_count: The number of candles before the pivot that must lead into it
+    :param after_candle_count: The number of candles after the pivot that must move away from it
+    :return: (support_index, support_price, resistance_index, resistance_price) arrays
+    """
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    support_index = np.flatnonzero(pivot_mask(low, before_candle_count, after_candle_count))
+    resistance_index = np.flatnonzero(pivot_mask(high, before_candle_count, after_candle_count, rising=True))
+    return support_index, low[support_index], resistance_index, high[resistance_index]
+
+
+def sensitivity(low, high, sens=2, before_candle_count=3) -> tuple:  # [list, list]:
+    """
+    Find the support and resistance levels for a given asset.
+    sensitivity:1 is recommended for daily charts or high frequency trade scalping.
+    :param low: Low prices, oldest candle first
+    :param high: High prices, oldest candle first
+    :param sens: sensitivity parameter default:2, level of detail 1-2-3 can be given to function
+    :param before_candle_count: The number of candles before the pivot that must lead into it
+    :return: support_list and resistance_list as (candle index, price) tuples
+    """
+    support_index, support_price, resistance_index, resistance_price = \
+        pivot_points(low, high, before_candle_count, sens)
+    support_list = list(zip(support_index.tolist(), support_price))
+    resistance_list = list(zip(resistance_index.tolist(), resistance_price))
+    return support_list, resistance_list
+
+
+@dataclass
+class SensitivityGrid:
+    """
+    Support and resistance pivots of one candle series for a whole grid of (before_candle_count, sens)
+    pairs. Only candles that are a pivot for at least one pair are kept, together with their run lengths,
+    so looking up a pair is a filter over a few short arrays instead of a new scan.
+    """
+    before_candle_counts: tuple
+    sens_values: tuple
+    support_index: np.ndarray
+    support_price: np.ndarray
+    support_runs: np.ndarray  # (before_runs, after_runs) rows for each kept support candle
+    resistance_index: np.ndarray
+    resistance_price: np.ndarray
+    resistance_runs: np.ndarray
+
+    def __getitem__(self, key) -> tuple:  # [list, list]:
+        """
+        Returns support_list and resistance_list for a (before_candle_count, sens) pair, the same as
+        sensitivity(low, high, sens, before_candle_count).
+        """
+        before_candle_count, sens = key
+        if before_candle_count not in self.before_candle_counts or sens not in self.sens_values:
+            raise KeyError(key)
+        found = (self.support_runs[0] >= before_candle_count) & (self.support_runs[1] >= sens)
+        support_list = list(zip(self.support_index[found].tolist(), self.support_price[found]))
+        found = (self.resistance_runs[0] >= before_candle_count) & (self.resistance_runs[1] >= sens)
+        resistance_list = list(zip(self.resistance_index[found].tolist(), self.resistance_price[found]))
+        return support_list, resistance_list
+
+    def keys(self) -> list:
+        return [(before, sens) for before in self.before_candle_counts for sens in self.sens_values]
+
+    def items(self) -> list:
+        return [(key, self[key]) for key in self.keys()]
+
+    def counts(self) -> dict:
+        """
+        Number of (supports, resistances) for every pair, handy for labelling a sensitivity slider.
+        """
+        return {key: (len(supports), len(resistances)) for key, (supports, resistances) in self.items()}
+
+
+def sensitivity_grid(low, high, before_candle_counts=range(1, 6), sens_values=range(1, 6)) -> SensitivityGrid:
+    """
+    Finds the pivots for every (before_candle_count, sens) pair in a single pass over the candles.
+    :param low: Low prices, oldest candle first
+    :param high: High prices, oldest candle first
+    :param before_candle_counts: Look-back window sizes to cover, e.g. range(1, 6)
+    :param sens_values: Sensitivity (look-ahead) values to cover, e.g. range(1, 6)
+    """
+    before_candle_counts, sens_values = tuple(before_candle_counts), tuple(sens_values)
+    columns = {}
+    for name, prices, rising in (('support', low, False), ('resistance', high, True)):
+        prices = np.ascontiguousarray(prices, dtype=np.float64)
+        runs = np.array(trend_runs(prices, rising=rising))
+        keep = (runs[0] >= min(before_candle_counts)) & (runs[1] >= min(sens_values))
+        keep[len(keep) - 1:] = False  # The last row is never a pivot candidate
+        index = np.flatnonzero(keep)
+        columns[f'{name}_index'], columns[f'{name}_price'], columns[f'{name}_runs'] = \
+            index, prices[index], runs[:, index]
+    return SensitivityGrid(before_candle_counts, sens_values, **columns)
+
+
+@dataclass
+class BatchLevels:
+    """
+    Support and resistance levels for many candle series at once, one row per series.
+    support_below holds every level under the latest close (supports, and resistances that price has
+    broken) highest first, resistance_above every level over it lowest first. Rows are padded with NaN.
+    """
+    support_mask: np.ndarray
+    resistance_mask: np.ndarray
+    latest_close: np.ndarray
+    support_below: np.ndarray
+    resistance_above: np.ndarray
+
+    def rows(self) -> list:
+        """
+        Returns (resistance_above, support_below) lists of floats for every row, like all_timeframe_sr prints.
+        """
+        return [(above[~np.isnan(above)].tolist(), below[~np.isnan(below)].tolist())
+                for above, below in zip(self.resistance_above, self.support_below)]
+
+
+def _packed(levels, descending) -> np.ndarray:
+    """
+    Sorts every row of a NaN-filled level matrix and drops the columns that are NaN in every row.
+    """
+    levels = -np.sort(-levels, axis=1) if descending else np.sort(levels, axis=1)  # NaN sorts last
+    width = int((~np.isnan(levels)).sum(axis=1).max(initial=0))
+    return levels[:, :width]
+
+
+def batch_levels(high, low, close, sens=2, before_candle_count=3, repeat_last=True) -> BatchLevels:
+    """
+    Finds support and resistance levels for a tickers-by-candles matrix in one vectorized call, splits
+    them around each row's latest close and falls back to the row's lowest low / highest high when a side
+    is empty.
+    :param high: 2-D high prices, one ticker per row, oldest candle first
+    :param low: 2-D low prices, same shape as high
+    :param close: 2-D close prices, same shape as high
+    :param sens: sensitivity parameter default:2, level of detail 1-2-3 can be given to function
+    :param before_candle_count: The number of candles before the pivot that must lead into it
+    :param repeat_last: Repeat the latest candle once like main() does with df.tail(1), turn it off if
+    the matrices already contain the repeated candle
+    """
+    high, low, close = (np.atleast_2d(np.asarray(prices, dtype=np.float64)) for prices in (high, low, close))
+    if repeat_last:
+        high, low, close = (np.concatenate([prices, prices[:, -1:]], axis=1) for prices in (high, low, close))
+    support_mask = pivot_mask(low, before_candle_count, sens)
+    resistance_mask = pivot_mask(high, before_candle_count, sens, rising=True)
+    latest_close = close[:, -1:]
+
+    below = np.concatenate([np.where(support_mask & (low < latest_close), low, np.nan),
+                            np.where(resistance_mask & (high <= latest_close), high, np.nan)], axis=1)
+    above = np.concatenate([np.where(support_mask & (low >= latest_close), low, np.nan),
+                            np.where(resistance_mask & (high > latest_close), high, np.nan)], axis=1)
+    support_below = _packed(below, descending=True)
+    resistance_above = _packed(above, descending=False)
+    if support_below.shape[1] == 0:
+        support_below = np.full((len(low), 1), np.nan)
+    if resistance_above.shape[1] == 0:
+        resistance_above = np.full((len(high), 1), np.nan)
+    empty = np.isnan(support_below[:, 0])
+    support_below[empty, 0] = low[empty].min(axis=1)
+    empty = np.isnan(resistance_above[:, 0])
+    resistance_above[empty, 0] = high[empty].max(axis=1)
+    return BatchLevels(support_mask, resistance_mask, latest_close[:, 0], support_below, resistance_above)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from frameselect import interval_ms, interval_offset_ms
+
+columns = ('unix', 'date', 'open', 'high', 'low', 'close', 'volume')
+
+
+def bucket_open_times(unix, interval) -> np.ndarray:
+    """
+    Open time in ms of the interval bucket every open time falls into, the same boundaries Binance uses.
+    """
+    length, offset = interval_ms[interval], interval_offset_ms.get(interval, 0)
+    return (np.asarray(unix, dtype=np.int64) - offset) // length * length + offset
+
+
+def resample(df, interval) -> pd.DataFrame:
+    """
+    Builds interval candles out of finer ones: first open, highest high, lowest low, last close and summed
+    volume per bucket. A first bucket the finer candles only partly cover is dropped, the last one is kept
+    even if it is still open, like the latest kline Binance returns.
+    :param df: Frame with unix (open time in ms), open, high, low, close and volume columns, oldest first
+    :param interval: Kline interval to build, e.g. '4h', it has to be a multiple of the finer interval
+    """
+    unix = df['unix'].to_numpy(dtype=np.int64)
+    bucket_open = bucket_open_times(unix, interval)
+    first = 0
+    if len(unix) and unix[0] != bucket_open[0]:
+        first = int(np.searchsorted(bucket_open, bucket_open[0], side='right'))
+    unix, bucket_open = unix[first:], bucket_open[first:]
+    if len(unix) == 0:
+        return pd.DataFrame({column: [] for column in columns})
+
+    starts = np.flatnonzero(np.r_[True, bucket_open[1:] != bucket_open[:-1]])
+    ends = np.r_[starts[1:], len(unix)] - 1
+    prices = {column: df[column].to_numpy(dtype=np.float64)[first:] for column in columns[2:]}
+    opened = bucket_open[starts]
+    return pd.DataFrame({'unix': opened, 'date': pd.to_datetime(opened, unit='ms'),
+                         'open': prices['open'][starts],
+                         'high': np.maximum.reduceat(prices['high'], starts),
+                         'low': np.minimum.reduceat(prices['low'], starts),
+                         'close': prices['close'][ends],
+                         'volume': np.add.reduceat(prices['volume'], starts)})
+
+
+def can_build(base, interval, candle_count, max_base_candles) -> bool:
+    """
+    True if candle_count interval candles can be built from at most max_base_candles base candles.
+    """
+    ratio, remainder = divmod(interval_ms[interval], interval_ms[base])
+    aligned = (interval_offset_ms.get(interval, 0) - interval_offset_ms.get(base, 0)) % interval_ms[base] == 0
+    return remainder == 0 and aligned and candle_count * ratio <= max_base_candles
+
+
+def plan_bases(intervals, candle_count, max_base_candles=1000, bases=tuple(interval_ms)) -> dict:
+    """
+    Picks the base intervals to download so every interval can be built from one of them, greedily taking the
+    base that covers the most intervals still left (the coarser one on a tie). Every interval is then built
+    from the coarsest picked base that covers it.
+    :param intervals: Kline intervals needed, e.g. ('3m', '5m', ..., '3d')
+    :param candle_count: Number of candles every interval needs
+    :param max_base_candles: Largest download per base, 1000 is a single klines request
+    :param bases: Intervals that can be downloaded
+    :return: Base interval -> intervals built from it
+    """
+    remaining, picked = list(dict.fromkeys(intervals)), []
+    while remaining:
+        base = max(bases, key=lambda base: (sum(can_build(base, interval, candle_count, max_base_candles)
+                                                 for interval in remaining), interval_ms[base]))
+        covered = [interval for interval in remaining if can_build(base, interval, candle_count, max_base_candles)]
+        if not covered:  # Longer than max_base_candles even on its own, download it as it is
+            base, covered = remaining[0], remaining[:1]
+        picked.append(base)
+        remaining = [interval for interval in remaining if interval not in covered]
+
+    plan = {}
+    for interval in dict.fromkeys(intervals):
+        builders = [base for base in picked if can_build(base, interval, candle_count, max_base_candles)]
+        base = max(builders, key=interval_ms.get) if builders else interval
+        plan.setdefault(base, []).append(interval)
+    return plan
@@ -1,28 +1,381 @@
+import bisect
+import os
+import re
+import threading
+from collections import namedtuple
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.engine import ddl
 import duckdb
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
 from sqlalchemy.engine.base import Engine
 import pandas as pd
 
+krx_markets = ('kospi', 'kosdaq')
+yahoo_suffixes = {'kospi': '.KS', 'kosdaq': '.KQ'}
+market_groups = {'krx': ('kospi', 'kosdaq'), 'us': ('nyse', 'nasdaq', 'amex')}
+TickerRow = namedtuple('TickerRow', ['code', 'name', 'market', 'short_code', 'yahoo_code'])
+
+
+def ticker_row(code, name, market) -> TickerRow:
+	"""
+	A tickers row with the KRX 'A' prefix stripped (short_code) and the Yahoo symbol worked out once.
+	"""
+	short_code = code[1:] if market in krx_markets else code
+	return TickerRow(code, name, market, short_code, short_code + yahoo_suffixes.get(market, ''))
+
+
+@dataclass
+class TickerIndex:
+	"""
+	The tickers table in hash maps, so code, name and market lookups are dictionary hits.
+	When a key is in the table more than once the first row wins, like rows[0] of the SQL lookups.
+	"""
+	codes: dict = field(default_factory=dict)  # code -> [TickerRow]
+	names: dict = field(default_factory=dict)  # name -> [TickerRow]
+	markets: dict = field(default_factory=dict)  # market -> [TickerRow]
+
+	@classmethod
+	def from_rows(cls, rows):
+		index = cls()
+		for row in rows:
+			if row[0] is None:  # Nothing to look up by, and no short code to work out
+				continue
+			row = ticker_row(*row)
+			index.codes.setdefault(row.code, []).append(row)
+			index.names.setdefault(row.name, []).append(row)
+			index.markets.setdefault(row.market, []).append(row)
+		return index
+
+	@staticmethod
+	def _first(rows, market=None) -> TickerRow:
+		for row in rows:
+			if market is None or row.market == market:
+				return row
+		return None
+
+	def find_code(self, code, market=None) -> TickerRow:
+		return self._first(self.codes.get(code, ()), market)
+
+	def find_name(self, name, market=None) -> TickerRow:
+		return self._first(self.names.get(name, ()), market)
+
+	@cached_property
+	def search(self):
+		"""
+		TickerSearch over the indexed rows, built on first use and kept with the index.
+		"""
+		return TickerSearch([row for rows in self.codes.values() for row in rows])
+
+
+def trigrams(text) -> set:
+	return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TickerSearch:
+	"""
+	Autocomplete over ticker names and codes, Korean or English. Exact and prefix matches come from a sorted
+	key list, when those are not enough names sharing trigrams with the query are ranked by Dice similarity.
+	"""
+	def __init__(self, rows, min_similarity=0.3):
+		self.rows, self.min_similarity = rows, min_similarity
+		keys, self.grams = [], {}
+		self.gram_counts = []
+		for number, row in enumerate(rows):
+			name = (row.name or '').upper()  # A NULL name is only found by its code
+			for key in dict.fromkeys((name, (row.code or '').upper(), (row.short_code or '').upper())):
+				if key:
+					keys.append((key, number))
+			grams = trigrams(name)
+			for gram in grams:
+				self.grams.setdefault(gram, []).append(number)
+			self.gram_counts.append(len(grams))
+		keys.sort()
+		self.keys = [key for key, _ in keys]
+		self.numbers = [number for _, number in keys]
+
+	def find(self, query, limit=10, market=None) -> list:
+		"""
+		:return: Up to limit TickerRows, exact matches first, then prefix matches, then similar names
+		"""
+		query = query.strip().upper()
+		if not query:
+			return []
+		exact, prefixed = [], []
+		for position in range(bisect.bisect_left(self.keys, query), len(self.keys)):
+			key = self.keys[position]
+			if not key.startswith(query) or len(exact) + len(prefixed) >= 4 * limit:
+				break
+			(exact if key == query else prefixed).append(self.numbers[position])
+		found = list(dict.fromkeys(exact + sorted(prefixed, key=lambda number: len(self.rows[number].name or ''))))
+
+		query_grams = trigrams(query)
+		if len(found) < limit and query_grams:
+			shared = {}
+			for gram in query_grams:
+				for number in self.grams.get(gram, ()):
+					shared[number] = shared.get(number, 0) + 1
+			scores = [(2 * count / (len(query_grams) + self.gram_counts[number]), number)
+					  for number, count in shared.items()]
+			found += [number for score, number in sorted(scores, key=lambda scored: -scored[0])
+					  if score >= self.min_similarity and number not in found]
+
+		rows = (self.rows[number] for number in dict.fromkeys(found))
+		return [row for row in rows if market is None or row.market == market][:limit]
+
+
+def database_path(database_url) -> str:
+	"""
+	File of a database URL, ':memory:' when there is none.
+	"""
+	return make_url(database_url).database or ':memory:'
+
+
+def file_mtime(path):
+	"""
+	Modification time of a database file, None for in-memory databases.
+	"""
+	if path != ':memory:' and os.path.isfile(path):
+		return os.path.getmtime(path)
+	return None
+
+
+class QueryResult:
+	"""
+	Rows of a finished query, read before its cursor went back to the pool.
+	"""
+	def __init__(self, rows, description):
+		self.rows, self.description = rows, description
+
+	def fetchall(self) -> list:
+		return self.rows
+
+	def fetchone(self):
+		return self.rows[0] if self.rows else None
+
+	def keys(self) -> list:
+		return [column[0] for column in self.description or ()]
+
+
+class SharedConnection:
+	"""
+	A DuckDB database opened once per process. Queries borrow a cursor from a small pool, DuckDB cursors are
+	separate connections to the same database, so Streamlit sessions can query side by side, and threads that
+	come and go (every Streamlit rerun runs on a new one) do not leave cursors behind. A connection to a file
+	that has been replaced is retired, it is closed once the cursors lent out have come back.
+	"""
+	def __init__(self, path, read_only=True, max_idle=4):
+		self.path, self.read_only, self.mtime = path, read_only, file_mtime(path)
+		self.connection = duckdb.connect(path, read_only=read_only)
+		self.lock = threading.Lock()
+		self.idle, self.max_idle = [], max_idle
+		self.open_cursors = 0
+		self.queries = 0
+		self.retired = self.closed = False
+		self.released = threading.Event()  # Set once the connection is closed
+
+	def _borrow(self):
+		with self.lock:
+			if self.retired:
+				return None
+			self.queries += 1
+			if self.idle:
+				return self.idle.pop()
+			self.open_cursors += 1
+			return self.connection.cursor()
+
+	def _give_back(self, cursor):
+		with self.lock:
+			if not self.retired and len(self.idle) < self.max_idle:
+				self.idle.append(cursor)
+				return
+			self.open_cursors -= 1
+			cursor.close()
+			if self.retired and self.open_cursors == len(self.idle):
+				self._close()
+
+	def execute(self, statement, parameters=()) -> QueryResult:
+		cursor = self._borrow()
+		if cursor is None:  # Retired after it was handed out, the connection to the new file answers
+			return shared_connection(self.path, self.read_only).execute(statement, parameters)
+		try:
+			cursor.execute(statement, parameters)
+			return QueryResult(cursor.fetchall(), cursor.description)
+		finally:
+			self._give_back(cursor)
+
+	@property
+	def stats(self) -> dict:
+		return {'read_only': self.read_only, 'cursors': self.open_cursors, 'queries': self.queries}
+
+	def _close(self):
+		for cursor in self.idle:
+			cursor.close()
+		self.open_cursors -= len(self.idle)
+		self.idle = []
+		self.closed = True
+		self.connection.close()
+		self.released.set()
+
+	def retire(self):
+		"""
+		Closes the connection now if no cursor is lent out, otherwise when the last one is given back.
+		"""
+		with self.lock:
+			self.retired = True
+			if self.open_cursors == len(self.idle):
+				self._close()
+
+	def close(self):
+		with self.lock:
+			self.retired = True
+			if not self.closed:
+				self._close()
+
+
+# :name, not the :: of a cast, and nothing inside '...' literals or "..." identifiers
+placeholder = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|(?<!:):(\w+)""")
+
+
+@lru_cache(maxsize=256)
+def compile_statement(statement, dialect) -> tuple:  # [str, tuple]:
+	"""
+	Rewrites the :name placeholders of statement for dialect once per statement shape.
+	:return: The statement to run and the parameter names in binding order, None when the driver binds by name
+	"""
+	if dialect == 'duckdb':
+		names = []
+
+		def bind(match):
+			if match.group(1) is None:  # Quoted text stays as it is
+				return match.group(0)
+			names.append(match.group(1))
+			return '?'
+		return placeholder.sub(bind, statement), tuple(names)
+	return statement, None
+
+
+_connections, _connections_lock = {}, threading.Lock()
+connection_counts = {'opened': 0, 'reused': 0, 'reopened': 0}
+
+
+def shared_connection(path, read_only=True) -> SharedConnection:
+	"""
+	The process wide SharedConnection of a DuckDB file, opened again when the file has been replaced.
+	"""
+	key = (path if path == ':memory:' else os.path.abspath(path), read_only)
+	with _connections_lock:
+		connection = _connections.get(key)
+		if connection is not None and connection.mtime != file_mtime(path):
+			# Other threads may still be running queries on it, and DuckDB hands out the open database of a path
+			# again, so the new file is only opened after their cursors have come back
+			connection.retire()
+			connection.released.wait()
+			connection_counts['reopened'] += 1
+			connection = None
+		if connection is None:
+			connection = _connections[key] = SharedConnection(path, read_only)
+			connection_counts['opened'] += 1
+		else:
+			connection_counts['reused'] += 1
+		return connection
+
+
+def connection_stats() -> dict:
+	"""
+	Open, reuse and reopen counts of the shared connections, and cursors and queries per database file.
+	"""
+	with _connections_lock:
+		return dict(connection_counts, databases={path: connection.stats
+												  for (path, _), connection in _connections.items()})
+
+
+def close_connections():
+	with _connections_lock:
+		for connection in _connections.values():
+			connection.close()
+		_connections.clear()
+
+
+_indexes, _cache_lock = {}, threading.RLock()
+
+
+def cached(cache, key, stock_ticker, build):
+	"""
+	cache[key] built by build() once per process, again only when the database file of stock_ticker has changed.
+	"""
+	mtime = file_mtime(database_path(stock_ticker.database_url))
+	with _cache_lock:
+		entry = cache.get(key)
+		if entry is None or entry[0] != mtime:
+			entry = cache[key] = (mtime, build())
+		return entry[1]
+
+
+_listings = {}
+
+
+def listing_frame(stock_ticker) -> pd.DataFrame:
+	"""
+	The whole tickers table with KRX codes stripped of their 'A' prefix and the Yahoo symbol in a yahoo column,
+	worked out column-wise once per process and database file.
+	"""
+	def build():
+		rows = stock_ticker.execute("SELECT code, name, market FROM tickers").fetchall()
+		df = pd.DataFrame(rows, columns=['code', 'name', 'market']).dropna()
+		krx = df['market'].isin(krx_markets)
+		df['code'] = df['code'].where(~krx, df['code'].str[1:])
+		df['yahoo'] = df['code'] + df['market'].map(yahoo_suffixes).fillna('')
+		return df.reset_index(drop=True)
+	return cached(_listings, (stock_ticker.database_url, 'all'), stock_ticker, build)
+
+
+def ticker_index(stock_ticker) -> TickerIndex:
+	"""
+	Loads the tickers table of stock_ticker's database into a TickerIndex once per process, again only when the
+	database file has changed since.
+	"""
+	def build():
+		return TickerIndex.from_rows(stock_ticker.execute("SELECT code, name, market FROM tickers").fetchall())
+	return cached(_indexes, stock_ticker.database_url, stock_ticker, build)
+
+
 @dataclass
 class StockTicker:
 	database_url: str = "sqlite:///codes.sqlite"
 	engine: Engine = None
 	read_only:bool = False
+	indexed: bool = False  # Answer lookups from the process wide TickerIndex instead of SQL
 
 	def __post_init__(self):
+		if self.is_duckdb:  # Queries go through the process wide shared_connection instead of an engine
+			return
 		connect_args={}
 		if self.read_only:
 			connect_args = {'read_only': True}
 		self.engine = create_engine(self.database_url, connect_args=connect_args)
 
+	@property
+	def is_duckdb(self) -> bool:
+		return self.database_url.startswith('duckdb:')
+
+	@property
+	def connection(self) -> SharedConnection:
+		return shared_connection(database_path(self.database_url), read_only=self.read_only)
+
+	@property
+	def index(self) -> TickerIndex:
+		return ticker_index(self)
+
+	def use_index(self, ticker) -> bool:
+		return self.indexed and '_' not in ticker and '%' not in ticker
+
 	def execute(self, statement, *multiparams, **params):
-		if self.database_url.startswith('duckdb:') and len(multiparams) > 0:
-			for name, _ in multiparams[0].items():
-				statement = statement.replace(f':{name}', '?')
-			# print(f"=== statement: {statement}")
-			return self.engine.execute(statement, list(multiparams[0].values()))
+		if self.is_duckdb:
+			values = multiparams[0] if len(multiparams) > 0 else params
+			statement, names = compile_statement(statement, 'duckdb')
+			return self.connection.execute(statement, [values[name] for name in names])
 		else:
 			return self.engine.execute(statement, *multiparams, **params)
 
@@ -31,7 +384,19 @@ class StockTicker:
 			return True
 		return False
 
+	def search(self, query, limit=10, market=None) -> list:
+		"""
+		Ranked TickerRows whose name or code matches query, for autocomplete.
+		"""
+		return self.index.search.find(query, limit=limit, market=market)
+
 	def get_ticker(self, name: str, market=None, yahoo=False) -> str:
+		if self.use_index(name):
+			row = self.index.find_name(name.upper(), market)
+			if row is None:
+				return None
+			return row.yahoo_code if yahoo else row.short_code
+
 		params = {'name': name.upper()}
 		op = '='
 		if '_' in name or '%' in name:
@@ -61,6 +426,9 @@ class StockTicker:
 	def get_market(self, ticker):
 		if self.is_krx_code(ticker):
 			ticker = 'A' + ticker
+		if self.use_index(ticker):
+			row = self.index.find_code(ticker.upper())
+			return None if row is None else row.market
 
 		params = {'code': ticker.upper()}
 		op = '='
@@ -95,9 +463,49 @@ class StockTicker:
 				return res
 			return ticker_or_name
 	
+	def resolve(self, index, ticker_or_name, market=None) -> TickerRow:
+		"""
+		The TickerRow of a KRX code, code or name, in that order, like normalize.
+		"""
+		if self.is_krx_code(ticker_or_name):
+			return index.find_code('A' + ticker_or_name, market)
+		key = ticker_or_name.upper()
+		return index.find_code(key, market) or index.find_name(key, market)
+
+	def normalize_many(self, tickers_or_names, market=None) -> pd.DataFrame:
+		"""
+		Resolves many tickers or names at once, from the TickerIndex when indexed, otherwise from a single
+		query over all of them.
+		:return: Frame with query, code (KRX codes without the 'A' prefix), name, market and yahoo columns,
+		None where nothing matched
+		"""
+		queries = list(tickers_or_names)
+		index = self.index if self.indexed else self.lookup_index(queries)
+		rows = [self.resolve(index, query, market) for query in queries]
+		return pd.DataFrame({'query': queries,
+							 'code': [row and row.short_code for row in rows],
+							 'name': [row and row.name for row in rows],
+							 'market': [row and row.market for row in rows],
+							 'yahoo': [row and row.yahoo_code for row in rows]})
+
+	def lookup_index(self, tickers_or_names) -> TickerIndex:
+		"""
+		TickerIndex of only the rows whose code or name is one of tickers_or_names, read in one query.
+		"""
+		keys = {('A' + key) if self.is_krx_code(key) else key.upper() for key in tickers_or_names}
+		if not keys:
+			return TickerIndex()
+		params = {f"k{number}": key for number, key in enumerate(sorted(keys))}
+		placeholders = ', '.join(f":{name}" for name in params)
+		sql = f"SELECT code, name, market FROM tickers WHERE code IN ({placeholders}) OR name IN ({placeholders})"
+		return TickerIndex.from_rows(self.execute(sql, params).fetchall())
+
 	def get_name(self, ticker: str, market=None) -> str:
 		if len(ticker) == 6 and ticker[:-1].isdigit():  # KRX 종목코드
 			ticker = 'A' + ticker
+		if self.use_index(ticker):
+			row = self.index.find_code(ticker.upper(), market)
+			return None if row is None else row.name
 
 		params = {'code': ticker.upper()}
 		op = '='
@@ -115,42 +523,19 @@ class StockTicker:
 			return rows[0][1]
 		return None
 
-	def get_listing(self, market: str) -> list:
+	def get_listing(self, market: str) -> pd.DataFrame:
+		"""
+		code, name, market and yahoo columns of a market, or of the 'krx', 'us' or 'all' groupings. Every listing
+		is built once per process from listing_frame and rebuilt when the database file changes, the frame is
+		shared, so copy it before changing it.
+		"""
 		market = market.lower()
-		where = []
-		params = {}
-		sql = "SELECT code, name, market FROM tickers"
-
-		if market == 'all':
-			pass
-		elif market == 'krx':
-			where.append("market=:market1 or market=:market2")
-			params['market1'] = 'kospi'
-			params['market2'] = 'kosdaq'
-		elif market == 'us':
-			where.append("market=:market1 or market=:market2 or market=:market3")
-			params['market1'] = 'nyse'
-			params['market2'] = 'nasdaq'
-			params['market3'] = 'amex'
-		elif market in ['kospi', 'kosdaq', 'nyse', 'nasdaq', 'amex']:
-			where.append("market=:market")
-			params['market'] = market
-		else:
+		if market not in market_groups and market not in ('all',) + market_groups['krx'] + market_groups['us']:
 			raise ValueError(f"'{market}' is an invalid market name")
 
-		if len(where) > 0:
-			sql = sql + f" WHERE {' OR '.join(where)}"
-
-		res = self.execute(sql, params)
-		df = pd.DataFrame(res.fetchall(), columns=res.keys())
-
-		def fix_krx_code(row):
-			# print("--", row)
-			if row['market'] in ['kospi', 'kosdaq']:
-				row['code'] = row['code'][1:]
-			return row
-
-		# df['code']. = [x[1:] for x in df['code'].values]
-		df = df.apply(fix_krx_code, axis=1)
-
-		return df
\ No newline at end of file
+		def build():
+			df = listing_frame(self)
+			if market != 'all':
+				df = df[df['market'].isin(market_groups.get(market, (market,)))].reset_index(drop=True)
+			return df
+		return cached(_listings, (self.database_url, market), self, build)
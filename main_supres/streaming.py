@@ -0,0 +1,168 @@
+import bisect
+from collections import deque
+from dataclasses import dataclass
+from indicators import IndicatorState
+
+
+@dataclass
+class StreamingSupres:
+    """
+    Keeps the support and resistance levels of the latest candle_count candles up to date, one closed
+    candle at a time. A candle's pivot status only depends on its own before/after window, so each update
+    checks the candle whose after-window has just been completed and the newest, still provisional candidate
+    that leans on the repeated last candle like the batch scan does. Older pivots never change again.
+    SMA, RSI and MACD of the closes are kept up to date in indicators.
+    """
+    candle_count: int = 254
+    sens: int = 2
+    before_candle_count: int = 3
+    sma_windows: tuple = (20, 50, 100)
+
+    def __post_init__(self):
+        self.lows = deque(maxlen=self.candle_count)
+        self.highs = deque(maxlen=self.candle_count)
+        self.latest_close = None
+        self.last_open_time = None
+        self.count = 0  # Candles seen so far, the absolute index of the next candle
+        # Confirmed pivots as (absolute index, price), oldest first, and the same prices kept sorted
+        self.supports, self.resistances = deque(), deque()
+        self.support_prices, self.resistance_prices = [], []
+        self.provisional_support = self.provisional_resistance = None
+        # Monotonic (absolute index, price) queues for the window's lowest low and highest high
+        self.min_lows, self.max_highs = deque(), deque()
+        self.indicators = IndicatorState(sma_windows=self.sma_windows)
+
+    @classmethod
+    def from_klines(cls, klines, **kwargs):
+        """
+        Creates a detector and feeds it historical klines, oldest first.
+        """
+        detector = cls(**kwargs)
+        for kline in klines:
+            detector.update(kline)
+        return detector
+
+    @property
+    def start(self) -> int:
+        """
+        Absolute index of the oldest candle in the window.
+        """
+        return self.count - len(self.lows)
+
+    def update(self, kline) -> bool:
+        """
+        Adds a closed Binance kline [open time, open, high, low, close, ...] to the window and refreshes the
+        pivots. Klines that are not newer than the last one are ignored.
+        :return: True if the kline was added
+        """
+        open_time = int(kline[0])
+        if self.last_open_time is not None and open_time <= self.last_open_time:
+            return False
+        self.last_open_time = open_time
+        high, low, self.latest_close = float(kline[2]), float(kline[3]), float(kline[4])
+        self.highs.append(high)
+        self.lows.append(low)
+        self.count += 1
+        self.indicators.update(self.latest_close)
+        self._push_extreme(self.min_lows, low, lambda kept: kept >= low)
+        self._push_extreme(self.max_highs, high, lambda kept: kept <= high)
+
+        # The candle whose after-window has just been filled with real candles gets its final status
+        confirmed = self.count - 1 - self.sens
+        if self._is_pivot(self.lows, confirmed, rising=False):
+            self._add_pivot(self.supports, self.support_prices, confirmed, self.lows)
+        if self._is_pivot(self.highs, confirmed, rising=True):
+            self._add_pivot(self.resistances, self.resistance_prices, confirmed, self.highs)
+        self._expire(self.supports, self.support_prices)
+        self._expire(self.resistances, self.resistance_prices)
+
+        # The newest candidate only passes because the last candle is repeated, it may still change
+        self.provisional_support = self.provisional_resistance = None
+        if self.sens > 0:
+            candidate = self.count - self.sens
+            if self._is_pivot(self.lows, candidate, rising=False):
+                self.provisional_support = (candidate, self.lows[candidate - self.start])
+            if self._is_pivot(self.highs, candidate, rising=True):
+                self.provisional_resistance = (candidate, self.highs[candidate - self.start])
+        return True
+
+    def _is_pivot(self, values, candle, rising) -> bool:
+        """
+        Checks one candle with the same rules as pivots.pivot_mask, positions after the last candle read as
+        a copy of the last candle.
+        """
+        position = candle - self.start
+        if position - self.before_candle_count < 0 or position >= len(values):
+            return False
+        for current in range(position - self.before_candle_count + 1, position + 1):
+            if (values[current] < values[current - 1]) if rising else (values[current] > values[current - 1]):
+                return False
+        for current in range(position + 1, min(position + self.sens, len(values) - 1) + 1):
+            if (values[current] > values[current - 1]) if rising else (values[current] < values[current - 1]):
+                return False
+        return True
+
+    def _add_pivot(self, pivots, prices, candle, values):
+        price = values[candle - self.start]
+        pivots.append((candle, price))
+        bisect.insort(prices, price)
+
+    def _expire(self, pivots, prices):
+        """
+        Drops pivots whose before-window no longer fits in the candle window.
+        """
+        while pivots and pivots[0][0] - self.before_candle_count < self.start:
+            _, price = pivots.popleft()
+            del prices[bisect.bisect_left(prices, price)]
+
+    def _push_extreme(self, extremes, price, dominated):
+        while extremes and dominated(extremes[-1][1]):
+            extremes.pop()
+        extremes.append((self.count - 1, price))
+        while extremes[0][0] < self.start:
+            extremes.popleft()
+
+    def _window_list(self, pivots, provisional) -> list:
+        start = self.start
+        levels = [(candle - start, price) for candle, price in pivots]
+        if provisional is not None:
+            levels.append((provisional[0] - start, provisional[1]))
+        return levels
+
+    @property
+    def support_list(self) -> list:
+        """
+        Support pivots as (candle index in the window, price), the same as pivots.sensitivity on the window.
+        """
+        return self._window_list(self.supports, self.provisional_support)
+
+    @property
+    def resistance_list(self) -> list:
+        """
+        Resistance pivots as (candle index in the window, price), the same as pivots.sensitivity on the window.
+        """
+        return self._window_list(self.resistances, self.provisional_resistance)
+
+    def chart_lines(self) -> tuple:  # [list, list, list, list]:
+        """
+        Check if the support and resistance lines are above or below the latest close price.
+        Levels come back sorted by price and an empty support_below / resistance_above falls back to the
+        window's lowest low / highest high.
+        :return: support_below, resistance_below, resistance_above, support_above
+        """
+        support_prices = list(self.support_prices)
+        if self.provisional_support is not None:
+            bisect.insort(support_prices, self.provisional_support[1])
+        resistance_prices = list(self.resistance_prices)
+        if self.provisional_resistance is not None:
+            bisect.insort(resistance_prices, self.provisional_resistance[1])
+
+        split = bisect.bisect_left(support_prices, self.latest_close)
+        support_below, resistance_below = support_prices[:split], support_prices[split:]
+        split = bisect.bisect_right(resistance_prices, self.latest_close)
+        support_above, resistance_above = resistance_prices[:split], resistance_prices[split:]
+        if not support_below and self.min_lows:
+            support_below.append(self.min_lows[0][1])
+        if not resistance_above and self.max_highs:
+            resistance_above.append(self.max_highs[0][1])
+        return support_below, resistance_below, resistance_above, support_above
@@ -0,0 +1,190 @@
+from dataclasses import dataclass, field
+import numpy as np
+import pivots
+import levels
+from indicators import indicator_series
+import patterns
+
+fibonacci_multipliers = 0.236, 0.382, 0.500, 0.618, 0.705, 0.786, 0.886
+
+
+@dataclass
+class SupresResult:
+    """
+    Plain data result of analyze(), everything the chart, the legend and the text outputs are built from.
+    """
+    support_list: list
+    resistance_list: list
+    support_below: list
+    resistance_below: list
+    resistance_above: list
+    support_above: list
+    fibonacci_uptrend: list
+    fibonacci_downtrend: list
+    indicators: dict
+    pattern_list: list = field(default_factory=list)
+    ribbon_windows: tuple = ()
+    ribbon: np.ndarray = None  # One row of moving averages per ribbon window
+    fibonacci_multipliers: tuple = fibonacci_multipliers
+
+    @property
+    def float_resistance_above(self) -> list:
+        """
+        Every level above the latest close, lowest first.
+        """
+        return list(map(float, sorted(self.resistance_above + self.resistance_below)))
+
+    @property
+    def float_support_below(self) -> list:
+        """
+        Every level below the latest close, highest first.
+        """
+        return list(map(float, sorted(self.support_below + self.support_above, reverse=True)))
+
+
+def ribbon(close, windows, kind='sma') -> np.ndarray:
+    """
+    Moving averages of close for many windows at once, all taken from a single cumulative sum.
+    :param close: Close prices without the repeated latest candle
+    :param windows: Window lengths, e.g. range(5, 205, 5)
+    :param kind: 'sma', or 'ema' for exponential averages seeded with the SMA of their first window like
+    pandas_ta.ema
+    :return: 2-D array with one row per window and one column per close, NaN until a window is full
+    """
+    close = np.asarray(close, dtype=np.float64)
+    windows = np.asarray(windows, dtype=np.int64).reshape(-1, 1)
+    total = np.concatenate([[0.0], np.cumsum(close)])
+    ends = np.arange(1, len(close) + 1)
+    starts = ends - windows
+    with np.errstate(invalid='ignore'):
+        averages = np.where(starts >= 0, (total[ends] - total[np.maximum(starts, 0)]) / windows, np.nan)
+    if kind == 'ema':
+        alpha = 2 / (windows[:, 0] + 1)
+        for candle in range(1, len(close)):
+            running = starts[:, candle] > 0  # Rows past their SMA seed
+            previous = averages[running, candle - 1]
+            averages[running, candle] = previous + alpha[running] * (close[candle] - previous)
+    return averages
+
+
+def indicators(close, sma1_window=20, sma2_window=50, sma3_window=100) -> dict:
+    """
+    Takes in close prices and three integer arguments, and returns three simple moving averages of the
+    closing price for the given lengths and the RSI.
+    :param close: Close prices without the repeated latest candle
+    :param sma1_window: The length of the first moving average, defaults to 20 (optional)
+    :param sma2_window: The length of the second moving average, defaults to 50 (optional)
+    :param sma3_window: The length of the third moving average, defaults to 100 (optional)
+    """
+    windows = sma1_window, sma2_window, sma3_window
+    series = indicator_series(close, sma_windows=windows)
+    inds = {f'SMA{window}': tuple(series[f'SMA{window}']) for window in windows}
+    inds['RSI'] = tuple(series['RSI'])
+    return inds
+
+
+def fibonacci_pricelevels(high_price, low_price, multipliers=fibonacci_multipliers) -> tuple:  # [list, list]:
+    """
+    Uptrend Fibonacci Retracement Formula =>
+    Fibonacci Price Level = High Price - (High Price - Low Price)*Fibonacci Level
+    :param high_price: High price for the period
+    :param low_price: Low price for the period
+    :param multipliers: Fibonacci levels
+    """
+    fibonacci_uptrend = [low_price + (high_price - low_price) * multiplier for multiplier in multipliers]
+    fibonacci_downtrend = [high_price - (high_price - low_price) * multiplier for multiplier in multipliers]
+    return fibonacci_uptrend, fibonacci_downtrend
+
+
+def candlestick_patterns(df) -> list:
+    """
+    Takes in a dataframe and returns a list of (pattern, date) tuples for the candlestick patterns found
+    between the 3rd and the 29th latest rows, newest first.
+    """
+    records = patterns.find_patterns(df['open'], df['high'], df['low'], df['close'], df['date'])
+    return [(pattern, date_text(date)) for pattern, date in records]
+
+
+def date_text(date) -> str:
+    """
+    Formats a candle date for the legend, numpy datetimes included.
+    """
+    if not hasattr(date, 'strftime'):
+        date = np.datetime64(date, 'us').item()
+    return date.strftime('%b-%d-%y')
+
+
+def level_shapes(level_list, x_end, label_x, color, width=1, font_size=15) -> tuple:  # [list, list]:
+    """
+    Plotly layout shapes and annotations of level lines as plain dicts, so a chart can add all of them in one
+    update_layout call instead of validating the layout again on every add_shape / add_annotation.
+    :param level_list: (candle index, price) pairs, a line starts one candle before its pivot and runs to x_end
+    :param label_x: x position of the price labels
+    :return: shapes, annotations
+    """
+    shapes = [dict(type='line', x0=candle - 1, y0=price, x1=x_end, y1=price, line=dict(color=color, width=width))
+              for candle, price in level_list]
+    annotations = [dict(x=label_x, y=price, text=str(price), font=dict(size=font_size, color=color))
+                   for _, price in level_list]
+    return shapes, annotations
+
+
+def chart_lines(support_list, resistance_list, latest_close, lowest_low, highest_high) -> tuple:
+    """
+    Check if the support and resistance lines are above or below the latest close price.
+    An empty support_below falls back to the lowest low and an empty resistance_above to the highest high.
+    :return: support_below, resistance_below, resistance_above, support_above
+    """
+    support_below, resistance_below, resistance_above, support_above = [], [], [], []
+    for _, support_line in support_list:
+        if support_line < latest_close:
+            support_below.append(support_line)
+        else:
+            resistance_below.append(support_line)
+    if len(support_below) == 0:
+        support_below.append(lowest_low)
+    for _, resistance_line in resistance_list:
+        if resistance_line > latest_close:
+            resistance_above.append(resistance_line)
+        else:
+            support_above.append(resistance_line)
+    if len(resistance_above) == 0:
+        resistance_above.append(highest_high)
+    return support_below, resistance_below, resistance_above, support_above
+
+
+def analyze(df, sens=2, before_candle_count=3, sma_windows=None, level_percent=0, patterns=False, ribbon_windows=(),
+            ribbon_kind='sma', grid=None) -> SupresResult:
+    """
+    Runs the whole level analysis without any chart, data source or UI dependency.
+    :param df: Candles with low, high and close columns (and date for patterns), oldest first, with the
+    latest candle repeated once like main() prepares it
+    :param sens: sensitivity parameter default:2, level of detail 1-2-3 can be given to function
+    :param before_candle_count: The number of candles before the pivot that must lead into it
+    :param sma_windows: sma1_window, sma2_window and sma3_window for indicators()
+    :param level_percent: Merge levels closer than this percentage into one zone, 0 keeps every pivot
+    :param patterns: Also look for candlestick patterns
+    :param ribbon_windows: Extra moving average windows to compute with ribbon()
+    :param ribbon_kind: 'sma' or 'ema' for the ribbon
+    :param grid: pivots.sensitivity_grid of df to pick the pivots from instead of scanning df again
+    """
+    low = np.asarray(df['low'], dtype=np.float64)
+    high = np.asarray(df['high'], dtype=np.float64)
+    close = np.asarray(df['close'], dtype=np.float64)
+    if grid is None:
+        support_list, resistance_list = pivots.sensitivity(low, high, sens, before_candle_count)
+    else:
+        support_list, resistance_list = grid[before_candle_count, sens]
+    if level_percent:  # Merge pivots closer than level_percent % into one zone each
+        support_list = levels.merged_pivots(support_list, percent=level_percent, candle_count=len(low))
+        resistance_list = levels.merged_pivots(resistance_list, percent=level_percent, candle_count=len(low))
+    support_below, resistance_below, resistance_above, support_above = \
+        chart_lines(support_list, resistance_list, close[-1], np.nanmin(low), np.nanmax(high))
+    fibonacci_uptrend, fibonacci_downtrend = fibonacci_pricelevels(resistance_above[-1], support_below[-1])
+    return SupresResult(support_list=support_list, resistance_list=resistance_list,
+                        support_below=support_below, resistance_below=resistance_below,
+                        resistance_above=resistance_above, support_above=support_above,
+                        fibonacci_uptrend=fibonacci_uptrend, fibonacci_downtrend=fibonacci_downtrend,
+                        indicators=indicators(close[:-1], **(sma_windows or {})),
+                        pattern_list=candlestick_patterns(df) if patterns else [],
+                        ribbon_windows=tuple(ribbon_windows), ribbon=ribbon(close[:-1], ribbon_windows, ribbon_kind))
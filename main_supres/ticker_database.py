@@ -0,0 +1,73 @@
+import argparse
+import os
+import time
+import duckdb
+
+default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "codes.ddb")
+krx_markets = ('kospi', 'kosdaq')
+
+
+def read_listing_sql(file_name) -> str:
+    """
+    DuckDB source of one listing file, CSV (any delimiter DuckDB sniffs) or Parquet. A file without a market
+    column takes the market from its name, e.g. kospi.csv.
+    """
+    quoted = "'" + file_name.replace("'", "''") + "'"
+    if file_name.lower().endswith('.parquet'):
+        source = f"read_parquet({quoted})"
+    else:  # All text, or 005930 would be read as the number 5930
+        source = f"read_csv_auto({quoted}, all_varchar=true)"
+    columns = [row[0].lower() for row in duckdb.sql(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+    if 'market' in columns:
+        market = "lower(trim(CAST(market AS VARCHAR)))"
+    else:
+        market = "'" + os.path.splitext(os.path.basename(file_name))[0].lower().replace("'", "''") + "'"
+    return f"SELECT CAST(code AS VARCHAR) AS code, CAST(name AS VARCHAR) AS name, {market} AS market FROM {source}"
+
+
+def build_database(file_names, path=default_path) -> int:
+    """
+    Builds the tickers table from listing files next to path and swaps it in with one rename, so readers see
+    either the old or the new database. Rows are stored sorted by market and code, codes are upper-cased and
+    KRX codes get the 'A' prefix StockTicker expects, and code, name and market are indexed.
+    :param file_names: CSV or Parquet files with code and name columns, and a market column or a market name
+    :return: Number of tickers written
+    """
+    listings = ' UNION ALL '.join(read_listing_sql(file_name) for file_name in file_names)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    for leftover in (temporary, temporary + '.wal'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    try:
+        connection = duckdb.connect(temporary)
+        try:
+            connection.execute(f"""
+                CREATE TABLE tickers AS
+                SELECT DISTINCT ON (code, market) code, name, market FROM (
+                    SELECT CASE WHEN list_contains(?, market) AND length(code) = 6 THEN 'A' || code
+                                ELSE code END AS code, upper(trim(name)) AS name, market
+                    FROM (SELECT upper(trim(code)) AS code, name, market FROM ({listings}))
+                    WHERE code IS NOT NULL AND name IS NOT NULL)
+                ORDER BY market, code""", [list(krx_markets)])
+            for column in ('code', 'name', 'market'):
+                connection.execute(f"CREATE INDEX tickers_{column} ON tickers ({column})")
+            count = connection.execute("SELECT count(*) FROM tickers").fetchone()[0]
+            connection.execute("CHECKPOINT")
+        finally:
+            connection.close()
+        os.replace(temporary, path)
+    finally:
+        for leftover in (temporary, temporary + '.wal'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the tickers table of codes.ddb")
+    parser.add_argument('files', nargs='+', help="Listing CSV or Parquet files, e.g. kospi.csv nasdaq.parquet")
+    parser.add_argument('--output', default=default_path, help="Database to replace")
+    args = parser.parse_args()
+    perf = time.perf_counter()
+    count = build_database(args.files, args.output)
+    print(f"{count} tickers written to {args.output} in {time.perf_counter() - perf:.2f} seconds")
@@ -0,0 +1,129 @@
+import json
+import math
+import time
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import market_data
+from candle_store import CandleStore, StoreLockedError, shared_store
+from klines import kline_frame
+
+source = 'yahoo'
+info_table = """
+    CREATE TABLE IF NOT EXISTS ticker_info (symbol VARCHAR PRIMARY KEY, info VARCHAR, fetched_at DOUBLE)"""
+day_ms = 86_400_000
+# Calendar days per candle of the daily and longer Yahoo intervals
+interval_days = {'1d': 1, '5d': 5, '1wk': 7, '1mo': 31, '3mo': 92}
+# Most days back Yahoo serves the intraday intervals
+intraday_limits = {'1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '60m': 730, '90m': 60, '1h': 730}
+
+
+def history_start(interval, candle_count=254, now=None) -> pd.Timestamp:
+    """
+    Earliest date Yahoo has to be asked from to get the latest candle_count candles. Daily candles skip weekends
+    and holidays, so about 1.5 calendar days are asked per candle, intraday intervals go as far back as allowed.
+    :param now: Current time in ms, defaults to the clock
+    """
+    now = int(time.time() * 1000) if now is None else now
+    if interval in intraday_limits:
+        days = intraday_limits[interval] - 1
+    elif interval == '1d':
+        days = math.ceil(candle_count * 1.5) + 7
+    else:
+        days = (candle_count + 1) * interval_days[interval]
+    return pd.Timestamp(now - days * day_ms, unit='ms').normalize()
+
+
+def history_klines(df) -> np.ndarray:
+    """
+    Turns a yfinance history() frame into kline rows [open time, open, high, low, close, volume, close time] for
+    CandleStore.write. Open times are the exchange's local dates in ms, the close time is not known and repeats it.
+    """
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    unix = index.asi8 // 1_000_000
+    return np.column_stack([unix, df['Open'], df['High'], df['Low'], df['Close'], df['Volume'], unix])
+
+
+def adjusted_since(candle, df) -> bool:
+    """
+    Whether a stored candle came back with other prices in a new yfinance history() frame, which happens when
+    Yahoo adjusts the past for a split or dividend. A candle missing from df counts as changed.
+    """
+    klines = history_klines(df)
+    same = klines[klines[:, 0] == candle['unix']]
+    return not len(same) or not np.allclose(same[0, 1:5].astype(float),
+                                            candle[['open', 'high', 'low', 'close']].astype(float), rtol=1e-6)
+
+
+@dataclass
+class YahooData:
+    """
+    Yahoo Finance adapter that only asks for the span of candles shown. History is kept in the CandleStore and
+    topped up from the last stored candle on, info answers are kept in a ticker_info table for info_ttl seconds.
+    Yahoo prices are split and dividend adjusted, so a top-up that no longer matches the stored candles it
+    overlaps replaces them with the whole span instead of being appended.
+    """
+    store: CandleStore = field(default_factory=shared_store)
+    info_ttl: float = 24 * 3600
+    ticker_factory: callable = market_data.yahoo_ticker
+    clock: callable = time.time
+
+    def __post_init__(self):
+        if info_table not in self.store.tables:
+            self.store.tables.append(info_table)
+
+    def _write(self, symbol, interval, df, replace=False) -> int:
+        return self.store.write(source, symbol, interval, history_klines(df), replace=replace)
+
+    def history(self, symbol, interval='1d', candle_count=254) -> pd.DataFrame:
+        """
+        Returns the latest candle_count candles of symbol like CandleStore.read, downloading only the candles
+        after the last stored one, or the bounded span when fewer than candle_count are stored. While the store
+        is locked by another process the span is downloaded without it.
+        """
+        try:
+            return self._stored_history(symbol, interval, candle_count)
+        except StoreLockedError:
+            start = history_start(interval, candle_count, now=int(self.clock() * 1000))
+            df = self.ticker_factory(symbol).history(start=start, interval=interval)
+            return kline_frame(history_klines(df)).tail(candle_count).reset_index(drop=True)
+
+    def _stored_history(self, symbol, interval, candle_count) -> pd.DataFrame:
+        stored = self.store.read(source, symbol, interval, candle_count)
+        ticker = self.ticker_factory(symbol)
+        start = history_start(interval, candle_count, now=int(self.clock() * 1000))
+        if len(stored) >= candle_count:
+            # From the last closed stored candle on, it has to come back unchanged for the rest to still fit
+            df = ticker.history(start=stored['date'].iloc[-2], interval=interval)
+            if adjusted_since(stored.iloc[-2], df):
+                self._write(symbol, interval, ticker.history(start=start, interval=interval), replace=True)
+            else:
+                self._write(symbol, interval, df)
+        else:
+            self._write(symbol, interval, ticker.history(start=start, interval=interval))
+            stored = self.store.read(source, symbol, interval, candle_count)
+            if len(stored) < candle_count and interval not in intraday_limits:  # Holidays or a short listing
+                self._write(symbol, interval, ticker.history(interval=interval, period='max'))
+        return self.store.read(source, symbol, interval, candle_count)
+
+    def info(self, symbol) -> dict:
+        """
+        Ticker.info of symbol, asked from Yahoo at most once every info_ttl seconds.
+        """
+        now = self.clock()
+        try:
+            rows = self.store.query("SELECT info, fetched_at FROM ticker_info WHERE symbol = ?", [symbol])
+        except StoreLockedError:
+            rows = []
+        if rows and now - rows[0][1] < self.info_ttl:
+            return json.loads(rows[0][0])
+        info = self.ticker_factory(symbol).info
+        try:
+            with self.store.connect() as connection:
+                connection.execute("INSERT OR REPLACE INTO ticker_info VALUES (?, ?, ?)",
+                                   [symbol, json.dumps(info, default=str), now])
+        except StoreLockedError:
+            pass  # Asked again next time
+        return info
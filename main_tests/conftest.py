@@ -0,0 +1,7 @@
+import os
+import sys
+
+# main_supres modules import each other by module name, the same way they are run from that folder
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+sys.path.insert(0, os.path.join(root, "main_supres"))
@@ -0,0 +1,27 @@
+import pandas as pd
+
+from main_supres import all_timeframe_sr, pivots
+
+
+def test_main_finds_every_timeframe_in_one_batch(tmp_path, monkeypatch):
+    df = pd.read_csv("BTCUSDT_1d.csv").iloc[::-1].reset_index(drop=True)
+    frames = {'1D': df, '4H': df.iloc[::-1].reset_index(drop=True), '3D': df.head(100)}
+    calls = []
+
+    def batch_levels(*args, **kwargs):
+        calls.append(len(args[0]))
+        return pivots.batch_levels(*args, **kwargs)
+
+    monkeypatch.setattr(all_timeframe_sr.pivots, 'batch_levels', batch_levels)
+    (tmp_path / 'main_supres').mkdir()
+    (tmp_path / 'run').mkdir()
+    monkeypatch.chdir(tmp_path / 'run')
+    all_timeframe_sr.main(frames, 'BTCUSDT')
+
+    assert calls == [2, 1]  # The two full timeframes together, the short one apart
+    text = (tmp_path / 'main_supres' / 'all_timeframes.txt').read_text()
+    assert [line.split()[1] for line in text.splitlines() if line.startswith('BTCUSDT')] == ['1D', '4H', '3D']
+    for i, frame in frames.items():
+        frame = frame.tail(all_timeframe_sr.candle_count)
+        (res_above, sup_below), = pivots.batch_levels(frame['high'], frame['low'], frame['close'], sens=2).rows()
+        assert f"BTCUSDT {i}\nResistance:{res_above}\nSupport:{sup_below}\n" in text
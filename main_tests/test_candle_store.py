@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from main_supres.candle_store import CandleStore
+
+hour = 3_600_000
+
+
+class FakeClient:
+    """
+    Serves klines from a CSV like client.get_klines, up to a movable "now".
+    """
+    def __init__(self, file_name):
+        df = pd.read_csv(file_name).iloc[::-1]  # The file holds 1h candles
+        self.klines = [[unix, str(o), str(h), str(l), str(c), '1.0', unix + hour - 1, '0']
+                       for unix, o, h, l, c in zip(df['unix'], df['open'], df['high'], df['low'], df['close'])]
+        self.available = len(self.klines) - 5
+        self.requested = []
+
+    @property
+    def now(self) -> int:
+        return self.klines[self.available - 1][0] + hour // 2  # Half way through the latest candle
+
+    def get_klines(self, symbol, interval, startTime, limit=500):
+        found = [kline for kline in self.klines[:self.available] if kline[0] >= startTime][:limit]
+        self.requested.append(len(found))
+        return found
+
+
+def test_top_up_fetches_only_new_candles(tmp_path):
+    client = FakeClient("BTCUSDT_15m.csv")
+    store = CandleStore(str(tmp_path / "candles.ddb"))
+    assert store.last_open_time('binance', 'BTCUSDT', '1h') is None
+    assert store.top_up(client, 'BTCUSDT', '1h', candle_count=260, now=client.now) == 260
+    assert store.top_up(client, 'BTCUSDT', '1h', now=client.now) == 1  # Only the possibly still open candle
+
+    client.klines[client.available - 1][4] = '1.5'  # The open candle closes with a different price
+    client.available += 2
+    assert store.top_up(client, 'BTCUSDT', '1h', now=client.now) == 3
+    assert client.requested == [260, 1, 3]
+
+    df = store.read('binance', 'BTCUSDT', '1h', candle_count=254)
+    assert len(df) == 254
+    assert df['unix'].is_monotonic_increasing
+    assert list(df.columns) == ['unix', 'date', 'open', 'high', 'low', 'close', 'volume']
+    assert df['unix'].iloc[-1] == client.klines[client.available - 1][0]
+    assert (df['close'] == 1.5).sum() == 1
+    store.close()
+
+    # Reopening the file keeps everything, other keys stay separate
+    store = CandleStore(str(tmp_path / "candles.ddb"))
+    assert len(store.read('binance', 'BTCUSDT', '1h')) == 262
+    assert len(store.read('binance', 'BTCUSDT', '4h')) == 0
+
+
+def test_stale_store_only_fetches_the_window(tmp_path):
+    client = FakeClient("BTCUSDT_15m.csv")
+    client.available = 60
+    store = CandleStore(str(tmp_path / "candles.ddb"))
+    store.top_up(client, 'BTCUSDT', '1h', candle_count=50, now=client.now)
+    client.available = len(client.klines)  # Weeks later, over 200 candles have closed since
+    assert store.top_up(client, 'BTCUSDT', '1h', candle_count=55, now=client.now) == 55
+    assert client.requested == [50, 55]
+    df = store.read('binance', 'BTCUSDT', '1h', candle_count=50)
+    assert df['unix'].iloc[-1] == client.klines[-1][0] and df['unix'].diff().iloc[1:].eq(hour).all()
+
+
+def hold_lock(path, seconds):
+    """
+    Another process that keeps the store open read-write, like a second telegram bot run.
+    """
+    holder = subprocess.Popen([sys.executable, '-c', f"import duckdb, time; c = duckdb.connect({str(path)!r}); "
+                                                     f"print('locked', flush=True); time.sleep({seconds})"],
+                              stdout=subprocess.PIPE, text=True)
+    assert holder.stdout.readline().strip() == 'locked'
+    return holder
+
+
+def test_locked_store_waits_then_downloads_without_it(tmp_path):
+    client = FakeClient("BTCUSDT_15m.csv")
+    path = tmp_path / "candles.ddb"
+    store = CandleStore(str(path), lock_timeout=0.3)
+    store.top_up(client, 'BTCUSDT', '1h', candle_count=100, now=client.now)
+
+    holder = hold_lock(path, 30)
+    try:
+        df = store.candles(client, 'BTCUSDT', '1h', candle_count=100, now=client.now)
+    finally:
+        holder.kill()
+        holder.wait()
+    assert len(df) == 100 and df['unix'].iloc[-1] == client.klines[client.available - 1][0]
+    assert sorted(os.listdir(tmp_path)) == ['candles.ddb']  # Nothing written next to the store
+
+    holder = hold_lock(path, 0.5)  # Released while the store is still retrying
+    started = time.monotonic()
+    store = CandleStore(str(path), lock_timeout=10)
+    assert len(store.candles(client, 'BTCUSDT', '1h', candle_count=100, now=client.now)) == 100
+    assert time.monotonic() - started < 10
+    holder.wait()
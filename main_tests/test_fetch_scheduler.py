@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from main_supres import fetch_scheduler, frameselect
+
+minute = 60_000
+
+
+class KlinesStub(BaseHTTPRequestHandler):
+    """
+    Mimics GET /api/v3/klines: one-minute klines up to server.now, a weight header and one 429 on demand.
+    """
+    def do_GET(self):
+        server = self.server
+        query = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.requests.append(query)
+            throttle = server.throttle_next
+            server.throttle_next = False
+            server.used_weight += fetch_scheduler.klines_weight(int(query['limit']))
+            used_weight = server.used_weight
+        time.sleep(0.05)
+        if throttle:
+            body, status, headers = b'{"code": -1003}', 429, {'Retry-After': '1'}
+        else:
+            start, limit = int(query['startTime']), int(query['limit'])
+            first = -(-start // minute) * minute
+            opens = range(first, min(first + limit * minute, server.now), minute)
+            klines = [[open_time, "1.0", "2.0", "0.5", "1.5", "10.0", open_time + minute - 1, "15.0", 3, "5.0",
+                       "7.5", "0"] for open_time in opens]
+            body, status, headers = json.dumps(klines).encode(), 200, {}
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('X-MBX-USED-WEIGHT-1M', str(used_weight))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KlinesStub)
+    server.lock, server.requests = threading.Lock(), []
+    server.in_flight = server.max_in_flight = server.used_weight = 0
+    server.throttle_next, server.now = False, 2500 * minute
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def test_paged_download(stub):
+    fetcher = fetch_scheduler.KlineFetcher(f"http://127.0.0.1:{stub.server_port}")
+    klines = fetcher.get_historical_klines('BTCUSDT', '1m', 100 * minute, limit=1000)
+    assert [kline[0] for kline in klines] == list(range(100 * minute, 2500 * minute, minute))
+    assert [int(query['startTime']) for query in stub.requests] == [100 * minute, 1099 * minute + 1,
+                                                                     2099 * minute + 1]
+
+
+def test_concurrent_jobs_and_retry_after(stub):
+    bucket = fetch_scheduler.TokenBucket(capacity=1200)
+    scheduler = fetch_scheduler.FetchScheduler(
+        fetch_scheduler.KlineFetcher(f"http://127.0.0.1:{stub.server_port}", bucket=bucket), max_workers=4)
+    stub.throttle_next = True
+    plan = frameselect.fetch_plan('1m', 500, now=stub.now - 1)  # The stub serves closed candles only
+    jobs = [fetch_scheduler.FetchJob(symbol, plan) for symbol in ('A', 'B', 'C', 'D')]
+    started = time.monotonic()
+    results = list(scheduler.run(jobs))
+    assert time.monotonic() - started >= 1  # Everyone waited for the Retry-After
+    assert sorted(job.symbol for job, _, _ in results) == ['A', 'B', 'C', 'D']
+    assert all(error is None and len(klines) == 500 for _, klines, error in results)
+    assert stub.max_in_flight > 1
+    assert bucket.tokens <= bucket.capacity - stub.used_weight + 1  # Synced to the reported weight
+
+
+def test_token_bucket_waits_for_weight():
+    now = [0.0]
+    bucket = fetch_scheduler.TokenBucket(capacity=10, period=10, clock=lambda: now[0],
+                                         sleep=lambda seconds: now.__setitem__(0, now[0] + seconds))
+    bucket.acquire(8)
+    bucket.acquire(5)  # 2 tokens left, 3 more come in 3 seconds
+    assert now[0] == pytest.approx(3)
+    bucket.observe_used(10)
+    bucket.pause(5)
+    bucket.acquire(1)
+    assert now[0] == pytest.approx(8)
+    assert fetch_scheduler.klines_weight(1000) == 5 and fetch_scheduler.klines_weight(99) == 1
@@ -27,3 +27,39 @@ def frame_select_data():
 def test_frameselect(frame_select_data):
     for frame, expected in frame_select_data:
         assert frameselect.frame_select(frame) == expected
+
+
+def test_fetch_plan_pages():
+    hour = frameselect.hour
+    now = 5000 * hour + 123
+    plan = frameselect.fetch_plan('1h', 254, now=now)
+    assert plan.start_time == 4747 * hour and plan.candle_count == 254
+    assert plan.pages == ((4747 * hour, 254),)
+
+    plan = frameselect.fetch_plan('1h', 1600, now=now)
+    assert plan.candle_count == 1600
+    assert plan.pages == ((3401 * hour, 1000), (4401 * hour, 600))
+
+
+def test_fetch_plan_from_start_time():
+    minute = frameselect.minute
+    now = 1000 * minute + 5
+    plan = frameselect.fetch_plan('1m', start_time=990 * minute + 7, now=now)
+    assert plan.pages == ((990 * minute, 11),)  # The stored latest candle is downloaded again
+    assert frameselect.fetch_plan('1m', start_time=2000 * minute, now=now).pages == ((1000 * minute, 1),)
+
+
+def test_fetch_klines_requests():
+    class Client:
+        def __init__(self):
+            self.calls = []
+
+        def get_klines(self, **kwargs):
+            self.calls.append(kwargs)
+            return [[kwargs['startTime']]] * kwargs['limit']
+
+    client = Client()
+    plan = frameselect.fetch_plan('1d', 1200, now=3000 * frameselect.day)
+    assert len(frameselect.fetch_klines(client, 'BTCUSDT', plan)) == 1200
+    assert [(call['startTime'], call['limit']) for call in client.calls] == list(plan.pages)
+    assert all(call['interval'] == '1d' and call['symbol'] == 'BTCUSDT' for call in client.calls)
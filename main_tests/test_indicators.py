@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_supres import indicators, streaming
+
+
+def closes(file_name):
+    return pd.read_csv(file_name, nrows=254).iloc[::-1]['close'].reset_index(drop=True)
+
+
+def pandas_ta_ema(close, length):
+    # pandas_ta.ema: the first value is the SMA of the first length closes, then ewm(adjust=False)
+    close = close.copy()
+    close.iloc[length - 1] = close.iloc[:length].mean()
+    close.iloc[:length - 1] = np.nan
+    return close.ewm(span=length, adjust=False).mean()
+
+
+def pandas_ta_macd(close, fast=12, slow=26, signal=9):
+    macd = pandas_ta_ema(close, fast) - pandas_ta_ema(close, slow)
+    signal_line = pandas_ta_ema(macd.loc[macd.first_valid_index():], signal).reindex(macd.index)
+    return macd, signal_line, macd - signal_line
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_run_matches_pandas(file_name):
+    close = closes(file_name)
+    series = indicators.IndicatorState(sma_windows=(10, 50)).run(close)
+    assert list(series) == ['SMA10', 'SMA50', 'RSI', 'MACD', 'MACDs', 'MACDh']
+    np.testing.assert_allclose(series['SMA10'], close.rolling(10).mean(), rtol=1e-10)
+    np.testing.assert_allclose(series['SMA50'], close.rolling(50).mean(), rtol=1e-10)
+    for name, expected in zip(('MACD', 'MACDs', 'MACDh'), pandas_ta_macd(close)):
+        np.testing.assert_allclose(series[name], expected, rtol=1e-9, atol=1e-9)
+
+
+def pinned_pandas_ta(file_name):
+    # pandas_ta's sma(20), rsi() and macd(12, 26, 9) of closes(file_name), frozen so CI checks them without it
+    return pd.read_csv(file_name.replace('.csv', '_indicators.csv'), float_precision='round_trip')
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_match_pinned_pandas_ta(file_name):
+    close, pinned = closes(file_name), pinned_pandas_ta(file_name)
+    np.testing.assert_array_equal(pinned['close'], close)
+    for series in (indicators.indicator_series(close, sma_windows=(20,)),
+                   indicators.IndicatorState(sma_windows=(20,)).run(close)):
+        assert list(series) == ['SMA20', 'RSI', 'MACD', 'MACDs', 'MACDh']
+        for name, values in series.items():
+            np.testing.assert_allclose(values, pinned[name], rtol=1e-9, atol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_pinned_values_match_pandas_ta(file_name):
+    ta = pytest.importorskip("pandas_ta")
+    close, pinned = closes(file_name), pinned_pandas_ta(file_name)
+    macd = ta.macd(close, fast=12, slow=26, signal=9)
+    np.testing.assert_allclose(pinned['SMA20'], ta.sma(close, 20), rtol=1e-10)
+    np.testing.assert_allclose(pinned['RSI'], ta.rsi(close), rtol=1e-10)
+    np.testing.assert_allclose(pinned['MACD'], macd['MACD_12_26_9'], rtol=1e-9)
+    np.testing.assert_allclose(pinned['MACDs'], macd['MACDs_12_26_9'], rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(pinned['MACDh'], macd['MACDh_12_26_9'], rtol=1e-9, atol=1e-9)
+
+
+def test_series_of_short_and_long_histories():
+    close = np.linspace(100, 200, 1000) + 10 * np.sin(np.arange(1000))  # Many blocks of decayed_sums
+    expected = indicators.IndicatorState().run(close)
+    for length in (0, 5, 30, 1000):
+        series = indicators.indicator_series(close[:length])
+        for name, values in series.items():
+            np.testing.assert_allclose(values, expected[name][:length], rtol=1e-10, atol=1e-9, err_msg=name)
+
+
+def test_seeded_state_keeps_going():
+    close = closes("BTCUSDT_15m.csv")
+    expected = indicators.IndicatorState().run(close)
+    state = indicators.IndicatorState.from_closes(close[:200])
+    for candle in range(200, len(close)):
+        values = state.update(close[candle])
+        for name, value in values.items():
+            np.testing.assert_allclose(value, expected[name][candle], rtol=1e-10)
+
+
+def test_streaming_indicators():
+    df = pd.read_csv("BTCUSDT_15m.csv", nrows=254).iloc[::-1]
+    klines = [[open_time, 0, high, low, close] for open_time, high, low, close in
+              zip(df['unix'], df['high'], df['low'], df['close'])]
+    detector = streaming.StreamingSupres.from_klines(klines, candle_count=100)
+    expected = indicators.IndicatorState().run(df['close'])
+    assert detector.indicators.values == pytest.approx({name: values[-1] for name, values in expected.items()})
@@ -0,0 +1,61 @@
+import asyncio
+import json
+
+import pandas as pd
+import websockets
+
+from main_supres.kline_stream import KlineStream
+from main_supres.streaming import StreamingSupres
+
+hour = 3_600_000
+
+
+def recorded_klines(file_name="BTCUSDT_15m.csv") -> list:
+    df = pd.read_csv(file_name).iloc[::-1]  # The file holds 1h candles
+    return [[int(unix), str(o), str(h), str(l), str(c), '1.0', int(unix) + hour - 1]
+            for unix, o, h, l, c in zip(df['unix'], df['open'], df['high'], df['low'], df['close'])]
+
+
+class SeedClient:
+    def __init__(self, klines):
+        self.klines = klines
+
+    def get_klines(self, symbol, interval, startTime, limit=500):
+        return [kline for kline in self.klines if kline[0] >= startTime][:limit]
+
+
+def event(kline, closed) -> str:
+    k = dict(zip('tohlcvT', kline), s='BTCUSDT', i='1h', x=closed)
+    return json.dumps({'stream': 'btcusdt@kline_1h', 'data': {'e': 'kline', 's': 'BTCUSDT', 'k': k}})
+
+
+def test_replayed_stream_feeds_buffers_and_callbacks():
+    klines = recorded_klines()
+    seeded, streamed = klines[:150], klines[149:]  # The last seeded candle is still open
+    closes = []
+    stream = KlineStream(('btcusdt',), frames=('1H',), candle_count=100, url='ws://127.0.0.1:0')
+    stream.on_close.append(lambda symbol, interval, detector: closes.append((symbol, interval, detector.count)))
+    stream.seed(SeedClient(seeded), now=seeded[-1][0] + hour // 2)
+    assert len(stream.closed['BTCUSDT', '1h']) == 100 and stream.open['BTCUSDT', '1h'] == seeded[-1]
+
+    async def replay(websocket, *args):
+        await websocket.send(json.dumps({'result': None, 'id': 1}))
+        for kline in streamed:
+            await websocket.send(event(kline[:4] + [kline[3]] + kline[5:], closed=False))
+            await websocket.send(event(kline, closed=True))
+
+    async def main():
+        async with websockets.serve(replay, '127.0.0.1', 0) as server:
+            stream.url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            await stream.run(reconnect=False)
+
+    asyncio.run(main())
+    assert len(closes) == len(streamed) and closes[-1] == ('BTCUSDT', '1h', 100 + len(streamed))
+    assert list(stream.closed['BTCUSDT', '1h']) == klines[-100:]
+    df = stream.frame('BTCUSDT', '1h')
+    assert len(df) == 100 and df['unix'].iloc[-1] == klines[-1][0]
+
+    expected = StreamingSupres.from_klines(klines[-100 - len(streamed):], candle_count=100)
+    detector = stream.detectors['BTCUSDT', '1h']
+    assert detector.support_list == expected.support_list
+    assert detector.chart_lines() == expected.chart_lines()
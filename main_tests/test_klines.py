@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from main_supres import klines, supres
+
+
+def binance_klines(file_name):
+    df = pd.read_csv(file_name).iloc[::-1]
+    return [[int(unix), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", "12.5", int(unix) + 59_999, "0", 10, "1", "2",
+             "0"] for unix, o, h, l, c in zip(df['unix'], df['open'], df['high'], df['low'], df['close'])]
+
+
+def test_kline_frame():
+    rows = binance_klines("BTCUSDT_15m.csv")
+    df = klines.kline_frame(rows)
+    assert list(df.columns) == ['unix', 'date', 'open', 'high', 'low', 'close', 'volume']
+    assert df['unix'].dtype == np.int64 and df['close'].dtype == np.float64
+    assert df['date'].dtype.kind == 'M'
+    assert df['unix'].tolist() == [row[0] for row in rows]
+    assert df['close'].tolist() == [float(row[4]) for row in rows]
+    assert len(klines.kline_frame([])) == 0
+
+
+def test_export_and_analysis(tmp_path):
+    df = klines.kline_frame(binance_klines("BTCUSDT_1d.csv"))
+    klines.export_csv(df, tmp_path / "BTCUSDT.csv")
+    exported = pd.read_csv(tmp_path / "BTCUSDT.csv")
+    assert list(exported.columns) == ['date', 'open', 'high', 'low', 'close', 'volume']
+    assert exported['close'].iloc[0] == df['close'].iloc[-1]
+
+    # The frame gives the same levels as the CSV the old path re-read
+    from_csv = exported.iloc[::-1].reset_index(drop=True)
+    frames = [pd.concat([frame.tail(254), frame.tail(1)], ignore_index=True) for frame in (df, from_csv)]
+    results = [supres.analyze(frame) for frame in frames]
+    assert results[0].support_list == results[1].support_list
+    assert results[0].resistance_list == results[1].resistance_list
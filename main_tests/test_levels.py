@@ -0,0 +1,43 @@
+import pandas as pd
+
+from main_supres import levels, pivots
+
+
+def test_cluster_levels_percent():
+    pivot_list = [(10, 100.0), (50, 100.3), (90, 100.4), (30, 120.0), (60, 50.0)]
+    zones = levels.cluster_levels(pivot_list, percent=0.5, candle_count=100)
+    # three pivots within 0.5% become one zone, the others stay alone
+    assert [zone.touches for zone in zones] == [3, 1, 1]
+    assert zones[0].low == 100.0 and zones[0].high == 100.4
+    assert zones[0].price == 100.3
+    assert (zones[0].first_index, zones[0].last_index) == (10, 90)
+    # is the newer single touch stronger than the older one
+    assert zones[1].price == 50.0 and zones[2].price == 120.0
+    assert zones[0].strength > zones[1].strength > zones[2].strength
+
+
+def test_cluster_levels_ticks():
+    pivot_list = [(1, 16750.25), (2, 16750.35), (3, 16751.0)]
+    zones = levels.cluster_levels(pivot_list, tick_size=0.01, ticks=20)
+    assert len(zones) == 2
+    assert zones[0].touches == 2
+    assert zones[0].price == 16750.3  # rounded to the tick size
+
+
+def test_tick_size():
+    symbol_info = {'symbol': 'BTCUSDT', 'filters': [
+        {'filterType': 'PRICE_FILTER', 'minPrice': '0.01000000', 'maxPrice': '1000000.00000000',
+         'tickSize': '0.01000000'},
+        {'filterType': 'LOT_SIZE', 'minQty': '0.00001000', 'stepSize': '0.00001000'}]}
+    assert levels.tick_size(symbol_info) == 0.01
+    assert levels.tick_size(None) is None
+
+
+def test_merged_pivots():
+    df = pd.read_csv('BTCUSDT_15m.csv', nrows=254).iloc[::-1]
+    support_list, _ = pivots.sensitivity(df['low'], df['high'], 0)
+    merged = levels.merged_pivots(support_list, percent=0.2)
+    # fewer lines, every zone price is one of the pivots and the list is ordered by latest touch
+    assert 0 < len(merged) < len(support_list)
+    assert {price for _, price in merged} <= {price for _, price in support_list}
+    assert levels.merged_pivots([]) == []
@@ -0,0 +1,118 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from main_supres import market_data
+from main_supres.candle_store import CandleStore
+
+minute = 60_000
+
+
+class FakeClient:
+    def __init__(self, now):
+        self.now = now
+        self.calls = 0
+
+    def get_historical_klines(self, symbol, interval, start_str, limit=1000):
+        self.calls += 1
+        first = -(-start_str // minute) * minute
+        return [[open_time, "1.0", "2.0", "0.5", str(open_time / minute), "10.0", open_time + minute - 1]
+                for open_time in range(first, self.now + 1, minute)]  # The still open candle included
+
+    def get_symbol_info(self, symbol):
+        self.calls += 1
+        return {'symbol': symbol, 'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'}]}
+
+
+class FakeYahooTicker:
+    ticker = 'AAPL'
+    info = {'shortName': 'Apple Inc.'}
+    first, periods = '2022-01-03', 2
+
+    def history(self, interval='1d', **kwargs):
+        index = pd.date_range(self.first, periods=self.periods, tz='America/New_York')
+        return pd.DataFrame({'Close': [float(day) for day in index.day]}, index=index)
+
+
+def test_record_and_replay_binance(tmp_path):
+    now = int(time.time() * 1000) // minute * minute
+    recorder = market_data.binance_client(lambda: FakeClient(now), mode='record', directory=str(tmp_path))
+    recorded = recorder.get_historical_klines('BTCUSDT', '1m', now - 299 * minute)
+    info = recorder.get_symbol_info('BTCUSDT')
+    assert len(recorded) == 300
+
+    def unavailable():
+        raise AssertionError("Replay must not create a live client")
+
+    # An hour later the same "300 candles before now" request gets the recorded candles back
+    replay = market_data.binance_client(unavailable, mode='replay', directory=str(tmp_path))
+    with open(market_data.klines_file(str(tmp_path), 'BTCUSDT', '1m')) as f:
+        recorded_at = json.load(f)['recorded_at']
+    replay.clock = lambda: (recorded_at + 3_600_000) / 1000
+    later = now + 3_600_000
+    assert replay.get_historical_klines('BTCUSDT', '1m', later - 299 * minute) == recorded
+    assert replay.get_klines(symbol='BTCUSDT', interval='1m', startTime=later - 10 * minute, limit=5) == \
+        recorded[-11:-6]
+    assert replay.get_symbol_info('BTCUSDT') == info
+    with pytest.raises(KeyError):
+        replay.get_symbol_info('ETHUSDT')
+
+    # Analysis code runs unchanged on top of a replay client
+    store = CandleStore(str(tmp_path / "candles.ddb"))
+    assert store.top_up(replay, 'BTCUSDT', '1m', candle_count=300, now=later + 30_000) == 300
+    assert store.read('binance', 'BTCUSDT', '1m')['close'].tolist() == [float(kline[4]) for kline in recorded]
+
+
+@pytest.mark.parametrize('recorded_second, replayed_second', [(50, 10), (50, 20), (0, 59), (59, 0)])
+def test_replay_window_moves_by_whole_candles(tmp_path, recorded_second, replayed_second):
+    candle = 1_700_000_000_000 // minute * minute
+    recorded_now = candle + recorded_second * 1000
+    recorder = market_data.RecordingClient(FakeClient(recorded_now), str(tmp_path))
+    recorded = recorder.get_historical_klines('BTCUSDT', '1m', candle - 253 * minute)
+    assert len(recorded) == 254
+
+    file_name = market_data.klines_file(str(tmp_path), 'BTCUSDT', '1m')
+    with open(file_name) as f:
+        recording = json.load(f)
+    with open(file_name, 'w') as f:  # As if recorded recorded_second seconds into the candle
+        json.dump(dict(recording, recorded_at=recorded_now), f)
+
+    # Replayed 5 candles later, wherever inside the candle the clock happens to be
+    later = candle + 5 * minute
+    replay = market_data.ReplayClient(str(tmp_path), clock=lambda: (later + replayed_second * 1000) / 1000)
+    assert replay.get_historical_klines('BTCUSDT', '1m', later - 253 * minute) == recorded
+
+
+def test_replay_latency(tmp_path, monkeypatch):
+    market_data.RecordingClient(FakeClient(10 * minute), str(tmp_path)).get_historical_klines('X', '1m', 0)
+    monkeypatch.setenv(market_data.mode_variable, 'replay')
+    monkeypatch.setenv(market_data.directory_variable, str(tmp_path))
+    monkeypatch.setenv(market_data.latency_variable, '0.05')
+    replay = market_data.binance_client()
+    started = time.perf_counter()
+    assert len(replay.get_historical_klines('X', '1m', 0)) == 11
+    assert time.perf_counter() - started >= 0.05
+    with pytest.raises(ValueError):
+        market_data.settings('offline')
+
+
+def test_record_and_replay_yahoo(tmp_path):
+    recorder = market_data.RecordingTicker(FakeYahooTicker(), str(tmp_path))
+    history, info = recorder.history(start=None, interval='1d', period='max'), recorder.info
+    replay = market_data.yahoo_ticker('AAPL', mode='replay', directory=str(tmp_path))
+    pd.testing.assert_frame_equal(replay.history(start=None, interval='1d', period='max'), history)
+    assert replay.info == info
+
+
+def test_recorded_yahoo_history_is_merged_and_replayed_from_start(tmp_path):
+    ticker = FakeYahooTicker()
+    recorder = market_data.RecordingTicker(ticker, str(tmp_path))
+    recorder.history(interval='1d', period='max')
+    ticker.first, ticker.periods = '2022-01-04', 3  # A top-up overlapping the first recording
+    recorder.history(interval='1d', start='2022-01-04')
+    replay = market_data.ReplayTicker('AAPL', str(tmp_path))
+    assert list(replay.history(interval='1d', period='max')['Close']) == [3.0, 4.0, 5.0, 6.0]
+    df = replay.history(interval='1d', start=pd.Timestamp('2022-01-05'))
+    assert list(df.index.day) == [5, 6]
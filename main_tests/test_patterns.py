@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_supres import patterns, supres
+
+
+def candles(file_name):
+    df = pd.read_csv(file_name, nrows=254).iloc[::-1]
+    df['date'] = pd.to_datetime(df['date'])
+    return pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
+
+
+def all_masks(df):
+    # Every pattern on every row
+    prices = [df[column].to_numpy(dtype=np.float64) for column in ('open', 'high', 'low', 'close')]
+    shifted = [np.concatenate([np.full(back, np.nan), column[:len(column) - back]])
+               for back in (0, 1, 2) for column in prices]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return patterns.pattern_masks(*shifted)
+
+
+def full_scan(df):
+    # Every pattern on every row, then the old row -3..-29 walk over the result
+    masks = all_masks(df)
+    found = []
+    for item in range(-3, -30, -1):
+        row = len(df) + item
+        for pattern, candle_count in patterns.pattern_candles.items():
+            if row >= candle_count - 1 and masks[pattern][row]:
+                found.append((pattern, df['date'].iloc[row].strftime('%b-%d-%y')))
+    return found
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_tail_window_matches_full_scan(file_name):
+    df = candles(file_name)
+    pattern_list = supres.candlestick_patterns(df)
+    assert pattern_list
+    assert pattern_list == full_scan(df)
+
+
+def test_known_candles():
+    dates = pd.date_range('2023-01-01', periods=33, freq='D')
+    flat = [100.0, 101.0, 99.0, 100.5]
+    ohlc = np.array([flat] * 33)
+    ohlc[26] = [105.0, 106.0, 94.0, 95.0]  # Long red candle
+    ohlc[27] = [94.0, 107.0, 93.0, 106.0]  # Engulfed by a long green one
+    ohlc[29] = [100.0, 104.0, 96.0, 100.1]  # Doji
+    found = patterns.find_patterns(*ohlc.T, dates)
+    assert ('bullish_engulfing', dates[27]) in found
+    assert ('doji', dates[29]) in found
+    assert [date for _, date in found] == sorted((date for _, date in found), reverse=True)
+    assert all(dates[4] <= date <= dates[30] for _, date in found)
+
+
+def test_short_history():
+    ohlc = np.array([[100.0, 101.0, 99.0, 100.0]] * 3)  # Dojis, but only the first row is in the window
+    assert patterns.find_patterns(*ohlc.T, ['a', 'b', 'c']) == [('doji', 'a')]
+    assert patterns.find_patterns(*ohlc[:2].T, ['a', 'b']) == []
+
+
+def pinned_patterns(file_name):
+    # The candlestick package's answer for every pattern and row of candles(file_name), empty where a pattern
+    # needs more candles than the row has before it
+    return pd.read_csv(file_name.replace('.csv', '_patterns.csv'), dtype=str, keep_default_na=False)
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_matches_pinned_candlestick_output(file_name):
+    df, pinned = candles(file_name), pinned_patterns(file_name)
+    assert list(pinned['date']) == list(df['date'].astype(str))
+    masks = all_masks(df)
+    for pattern, candle_count in patterns.pattern_candles.items():
+        assert (pinned[pattern][:candle_count - 1] == '').all()
+        expected = pinned[pattern][candle_count - 1:].astype(int).astype(bool).to_numpy()
+        np.testing.assert_array_equal(masks[pattern][candle_count - 1:], expected, err_msg=pattern)
+
+    expected = [(pattern, df['date'].iloc[item].strftime('%b-%d-%y')) for item in range(-3, -30, -1)
+                for pattern in patterns.pattern_candles if pinned[pattern].iloc[item] == '1']
+    assert supres.candlestick_patterns(df) == expected
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_pinned_output_matches_candlestick_package(file_name):
+    candlestick = pytest.importorskip("candlestick.candlestick")
+    reference, pinned = candles(file_name), pinned_patterns(file_name)
+    for pattern in patterns.pattern_candles:
+        reference = getattr(candlestick, pattern)(reference, target=pattern)
+        found = reference[pattern].map({True: '1', False: '0'}).fillna('')
+        assert list(found) == list(pinned[pattern]), pattern
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_supres import pivots
+
+
+def candles(file_name):
+    # Same preparation as main(): oldest candle first and the latest candle repeated once
+    df = pd.read_csv(file_name, nrows=254)
+    df = df.iloc[::-1]
+    return pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
+
+
+def loop_sensitivity(df, sens):
+    # The per-row scan that pivots.sensitivity replaces
+    support_list, resistance_list = [], []
+    for row in range(3, len(df) - 1):
+        try:
+            if all(df.low[i] <= df.low[i - 1] for i in range(row - 2, row + 1)) and \
+                    all(df.low[i] >= df.low[i - 1] for i in range(row + 1, row + sens + 1)):
+                support_list.append((row, df.low[row]))
+        except KeyError:
+            pass
+        try:
+            if all(df.high[i] >= df.high[i - 1] for i in range(row - 2, row + 1)) and \
+                    all(df.high[i] <= df.high[i - 1] for i in range(row + 1, row + sens + 1)):
+                resistance_list.append((row, df.high[row]))
+        except KeyError:
+            pass
+    return support_list, resistance_list
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+@pytest.mark.parametrize("sens", [1, 2, 3])
+def test_sensitivity_matches_loop(file_name, sens):
+    df = candles(file_name)
+    assert pivots.sensitivity(df['low'], df['high'], sens) == loop_sensitivity(df, sens)
+
+
+def test_pivot_points():
+    low = [5, 4, 3, 2, 3, 4, 5, 5]
+    high = [1, 2, 3, 4, 3, 2, 1, 1]
+    support_index, support_price, resistance_index, resistance_price = pivots.pivot_points(low, high)
+    # is the single valley and peak found
+    assert support_index.tolist() == [3]
+    assert support_price.tolist() == [2.0]
+    assert resistance_index.tolist() == [3]
+    assert resistance_price.tolist() == [4.0]
+
+
+def test_short_series():
+    # no candles, no pivots
+    assert pivots.sensitivity([], []) == ([], [])
+    assert pivots.sensitivity([1.0], [1.0]) == ([], [])
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_sensitivity_grid(file_name):
+    df = candles(file_name)
+    grid = pivots.sensitivity_grid(df['low'], df['high'])
+    # is every pair of the default 5x5 grid there
+    assert len(grid.keys()) == 25
+    for before_candle_count, sens in grid.keys():
+        assert grid[before_candle_count, sens] == \
+               pivots.sensitivity(df['low'], df['high'], sens, before_candle_count)
+    assert grid.counts()[3, 2] == tuple(map(len, pivots.sensitivity(df['low'], df['high'])))
+    with pytest.raises(KeyError):
+        grid[6, 1]
+
+
+def split_levels(df, sens):
+    # all_timeframe_sr split: broken levels change sides, empty sides fall back to the extremes
+    support_list, resistance_list = pivots.sensitivity(df['low'], df['high'], sens)
+    latest_close = df['close'].iloc[-1]
+    sup_below = sorted([p for _, p in support_list if p < latest_close] +
+                       [p for _, p in resistance_list if p <= latest_close], reverse=True)
+    res_above = sorted([p for _, p in support_list if p >= latest_close] +
+                       [p for _, p in resistance_list if p > latest_close])
+    return res_above or [df['high'].max()], sup_below or [df['low'].min()]
+
+
+@pytest.mark.parametrize("sens", [1, 2, 3])
+def test_batch_levels(sens):
+    df = pd.read_csv("BTCUSDT_15m.csv").iloc[::-1].reset_index(drop=True)
+    windows = [df.iloc[start:start + 100] for start in range(0, len(df) - 100, 7)]
+    high, low, close = (np.stack([window[column].to_numpy() for window in windows])
+                        for column in ('high', 'low', 'close'))
+    batch = pivots.batch_levels(high, low, close, sens=sens)
+    # is every row the same as running that ticker on its own
+    assert len(batch.rows()) == len(windows)
+    for window, row in zip(windows, batch.rows()):
+        window = pd.concat([window, window.tail(1)], axis=0, ignore_index=True)
+        assert row == split_levels(window, sens)
+
+
+def test_batch_levels_fallback():
+    # a straight line up has no pivots, both sides fall back to the extremes
+    prices = np.arange(1.0, 11.0)
+    batch = pivots.batch_levels([prices + 1], [prices], [prices + 0.5])
+    assert batch.rows() == [([11.0], [1.0])]
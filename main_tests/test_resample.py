@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from main_supres import resample
+
+
+def hourly():
+    df = pd.read_csv("BTCUSDT_15m.csv").iloc[::-1].reset_index(drop=True)  # The file holds 1h candles
+    df['volume'] = df['Volume USDT']
+    return df
+
+
+def test_resample_matches_pandas():
+    df = hourly()
+    four_hours = resample.resample(df, '4h')
+    expected = df.set_index(pd.to_datetime(df['unix'], unit='ms')).resample('4H', origin='epoch').agg(
+        {'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'}).dropna()
+    if df['unix'][0] % (4 * 3_600_000):  # The partly covered first bucket is dropped
+        expected = expected.iloc[1:]
+    assert (four_hours['unix'] % (4 * 3_600_000) == 0).all()
+    assert four_hours['date'].tolist() == expected.index.tolist()
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        np.testing.assert_allclose(four_hours[column], expected[column])
+
+
+def test_partial_first_bucket_and_week():
+    day = 86_400_000
+    unix = np.arange(2, 30) * day  # 1970-01-03 (Saturday) onwards
+    df = pd.DataFrame({'unix': unix, 'open': np.arange(28.0), 'high': np.arange(28.0) + 1,
+                       'low': np.arange(28.0) - 1, 'close': np.arange(28.0) + 0.5, 'volume': np.ones(28)})
+    weeks = resample.resample(df, '1w')
+    assert (weeks['date'].dt.dayofweek == 0).all()  # Mondays
+    assert weeks['unix'].tolist() == [4 * day, 11 * day, 18 * day, 25 * day]
+    assert weeks['volume'].tolist() == [7, 7, 7, 5]  # The latest week is still open
+    assert weeks['open'][0] == 2 and weeks['close'][0] == 8.5
+    assert len(resample.resample(df.head(1), '1w')) == 0
+
+
+def test_plan_bases():
+    intervals = ['3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d']
+    plan = resample.plan_bases(intervals, 255)
+    assert sorted(interval for built in plan.values() for interval in built) == sorted(intervals)
+    assert len(plan) < len(intervals)
+    for base, built in plan.items():
+        assert all(resample.can_build(base, interval, 255, 1000) for interval in built)
+    assert plan['1d'] == ['1d', '3d']
+    assert len(resample.plan_bases(intervals, 255, 3000)) < len(plan)
+    assert resample.plan_bases(['1d'], 2000) == {'1d': ['1d']}
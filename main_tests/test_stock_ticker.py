@@ -0,0 +1,212 @@
+import os
+
+import duckdb
+import pytest
+
+from main_supres import stock_ticker
+from main_supres.stock_ticker import StockTicker
+
+rows = [('A005930', '삼성전자', 'kospi'), ('A035720', '카카오', 'kospi'), ('A247540', '에코프로비엠', 'kosdaq'),
+        ('AAPL', 'APPLE INC', 'nasdaq'), ('IBM', 'INTERNATIONAL BUSINESS MACHINES', 'nyse'),
+        ('SPY', 'SPDR S&P 500 ETF TRUST', 'amex')]
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    path = tmp_path / 'codes.ddb'
+    connection = duckdb.connect(str(path))
+    connection.execute("CREATE TABLE tickers (code VARCHAR, name VARCHAR, market VARCHAR)")
+    connection.executemany("INSERT INTO tickers VALUES (?, ?, ?)", rows)
+    connection.close()
+    return f"duckdb:///{path}"
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_lookups(database_url, indexed):
+    s = StockTicker(database_url=database_url, read_only=True, indexed=indexed)
+    assert s.normalize('005930', yahoo=True) == '005930.KS'
+    assert s.normalize('247540', yahoo=True) == '247540.KQ'
+    assert s.normalize('삼성전자') == '005930' and s.normalize('삼성전자', yahoo=True) == '005930.KS'
+    assert s.normalize('aapl') == 'aapl' and s.normalize('apple inc', yahoo=True) == 'AAPL'
+    assert s.get_name('035720') == '카카오' and s.get_name('IBM', market='nasdaq') is None
+    assert s.get_market('SPY') == 'amex' and s.get_market('000000') is None
+    assert s.get_code('APPLE INC', market='nyse') is None
+    assert s.get_ticker('APPLE%') == 'AAPL'  # LIKE patterns still go to SQL
+
+
+def test_index_is_loaded_once(database_url):
+    s = StockTicker(database_url=database_url, read_only=True, indexed=True)
+    assert s.index is StockTicker(database_url=database_url, read_only=True, indexed=True).index
+    assert s.index.find_code('A005930').yahoo_code == '005930.KS'
+
+
+def add_rows(database_url, *new_rows):
+    stock_ticker.close_connections()  # DuckDB will not open a file read-write while it is open read-only
+    connection = duckdb.connect(stock_ticker.database_path(database_url))
+    connection.executemany("INSERT INTO tickers VALUES (?, ?, ?)", new_rows)
+    connection.close()
+
+
+def test_index_skips_rows_without_a_code(database_url):
+    add_rows(database_url, (None, '코드없음', 'kospi'))
+    s = StockTicker(database_url=database_url, read_only=True, indexed=True)
+    assert s.normalize('삼성전자', yahoo=True) == '005930.KS'
+    assert s.get_ticker('코드없음') is None
+
+
+def test_search(database_url):
+    s = StockTicker(database_url=database_url, read_only=True, indexed=True)
+    assert [row.code for row in s.search('삼성')] == ['A005930']
+    assert [row.short_code for row in s.search('00')] == ['005930']
+    assert s.search('apple')[0].code == 'AAPL'
+    assert s.search('ibm')[0].name == 'INTERNATIONAL BUSINESS MACHINES'
+    assert s.search('BUSINES MACHINES')[0].code == 'IBM'  # Trigram match despite the typo
+    assert s.search('에코프로')[0].yahoo_code == '247540.KQ'
+    assert s.search('a', market='amex') == [] and s.search('s', market='amex')[0].code == 'SPY'
+    assert s.search('   ') == []
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_normalize_many(database_url, indexed):
+    s = StockTicker(database_url=database_url, read_only=True, indexed=indexed)
+    df = s.normalize_many(['005930', '카카오', 'aapl', 'Apple Inc', 'NOPE', '247540'])
+    assert list(df.columns) == ['query', 'code', 'name', 'market', 'yahoo']
+    assert list(df['code']) == ['005930', '035720', 'AAPL', 'AAPL', None, '247540']
+    assert list(df['yahoo']) == ['005930.KS', '035720.KS', 'AAPL', 'AAPL', None, '247540.KQ']
+    assert list(df['market'])[:2] == ['kospi', 'kospi']
+    assert list(s.normalize_many(['IBM', 'SPY'], market='nyse')['code']) == ['IBM', None]
+    assert s.normalize_many([]).empty
+
+
+def test_listings_are_cached_until_the_file_changes(database_url, tmp_path):
+    s = StockTicker(database_url=database_url, read_only=True)
+    krx = s.get_listing('KRX')
+    assert list(krx['code']) == ['005930', '035720', '247540']
+    assert list(krx['yahoo']) == ['005930.KS', '035720.KS', '247540.KQ']
+    assert list(s.get_listing('us')['code']) == ['AAPL', 'IBM', 'SPY']
+    assert list(s.get_listing('kosdaq')['name']) == ['에코프로비엠'] and len(s.get_listing('all')) == len(rows)
+    assert s.get_listing('krx') is krx
+    with pytest.raises(ValueError):
+        s.get_listing('lse')
+
+    stock_ticker.close_connections()  # DuckDB will not open a file read-write while it is open read-only
+    connection = duckdb.connect(str(tmp_path / 'codes.ddb'))
+    connection.execute("INSERT INTO tickers VALUES ('A000660', 'SK하이닉스', 'kospi')")
+    connection.close()
+    os.utime(tmp_path / 'codes.ddb', (0, 1e9))  # A new mtime even on a coarse clock
+    s = StockTicker(database_url=database_url, read_only=True)
+    assert list(s.get_listing('krx')['code']) == ['005930', '035720', '247540', '000660']
+
+
+def test_connection_is_shared_across_instances_and_threads(database_url):
+    from concurrent.futures import ThreadPoolExecutor
+
+    stock_ticker.close_connections()
+    before = dict(stock_ticker.connection_counts)
+
+    def lookup(code):
+        return StockTicker(database_url=database_url, read_only=True).get_name(code)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        names = list(pool.map(lookup, ['005930', 'AAPL', 'IBM', 'SPY'] * 10))
+    assert names[:4] == ['삼성전자', 'APPLE INC', 'INTERNATIONAL BUSINESS MACHINES', 'SPDR S&P 500 ETF TRUST']
+    stats = stock_ticker.connection_stats()
+    assert stats['opened'] - before['opened'] == 1
+    database = stats['databases'][str(stock_ticker.database_path(database_url))]
+    assert database['queries'] == 40 and 1 <= database['cursors'] <= 4 and database['read_only']
+
+
+def test_threads_do_not_leave_cursors_behind(database_url):
+    import threading
+
+    stock_ticker.close_connections()
+    for _ in range(50):  # A new thread per lookup, like Streamlit reruns
+        thread = threading.Thread(target=StockTicker(database_url=database_url, read_only=True).get_name,
+                                  args=('005930',))
+        thread.start()
+        thread.join()
+    database = stock_ticker.connection_stats()['databases'][str(stock_ticker.database_path(database_url))]
+    assert database['queries'] == 50 and database['cursors'] == 1
+
+
+def test_statements_are_compiled_once_per_shape(database_url):
+    s = StockTicker(database_url=database_url, read_only=True)
+    s.get_name('005930')
+    before = stock_ticker.compile_statement.cache_info()
+    for code in ['035720', 'AAPL', 'IBM', 'SPY'] * 25:
+        s.get_name(code)
+    after = stock_ticker.compile_statement.cache_info()
+    assert after.misses == before.misses and after.hits - before.hits == 100
+    assert stock_ticker.compile_statement("SELECT :a::VARCHAR, :b, :a", 'duckdb') == \
+        ("SELECT ?::VARCHAR, ?, ?", ('a', 'b', 'a'))
+    assert stock_ticker.compile_statement("SELECT '09:30', 'it''s :b', \"x:y\" FROM t WHERE code = :code", 'duckdb') == \
+        ("SELECT '09:30', 'it''s :b', \"x:y\" FROM t WHERE code = ?", ('code',))
+    rows = s.execute("SELECT name || ' :code' FROM tickers WHERE code = :code", code='A005930').fetchall()
+    assert rows == [('삼성전자 :code',)]
+
+
+def test_build_database_swaps_in_an_indexed_table(tmp_path):
+    from main_supres import ticker_database
+
+    (tmp_path / 'kospi.csv').write_text("code,name\n005930,삼성전자\n035720,카카오\n")
+    duckdb.sql("SELECT * FROM (VALUES ('aapl', 'Apple Inc', 'NASDAQ'), ('IBM', 'International Business Machines', "
+               "'nyse')) AS t(code, name, market)").write_parquet(str(tmp_path / 'us.parquet'))
+    path = str(tmp_path / 'built.ddb')
+    assert ticker_database.build_database([str(tmp_path / 'kospi.csv'), str(tmp_path / 'us.parquet')], path) == 4
+
+    s = StockTicker(database_url=f"duckdb:///{path}", read_only=True)
+    assert s.normalize('삼성전자', yahoo=True) == '005930.KS' and s.get_ticker('APPLE INC') == 'AAPL'
+    assert s.get_market('IBM') == 'nyse'
+    indexes = s.execute("SELECT index_name FROM duckdb_indexes() WHERE table_name = 'tickers'").fetchall()
+    assert sorted(name for name, in indexes) == ['tickers_code', 'tickers_market', 'tickers_name']
+
+    (tmp_path / 'kospi.csv').write_text("code,name\n005930,삼성전자\n000660,SK하이닉스\n035720,카카오\n")
+    os.utime(tmp_path / 'kospi.csv')
+    assert ticker_database.build_database([str(tmp_path / 'kospi.csv')], path) == 3
+    assert s.get_name('000660') == 'SK하이닉스' and s.get_market('IBM') is None  # Reopened on the new file
+    assert sorted(os.listdir(tmp_path)) == ['built.ddb', 'kospi.csv', 'us.parquet']
+
+
+def test_search_skips_null_names(database_url):
+    add_rows(database_url, ('A000020', None, 'kospi'), ('NONAME', None, 'nyse'))
+    s = StockTicker(database_url=database_url, read_only=True, indexed=True)
+    assert s.search('삼성')[0].code == 'A005930'
+    assert [row.code for row in s.search('000020')] == ['A000020']
+    assert s.search('NONAME')[0].name is None
+
+
+def test_rebuild_does_not_break_running_queries(tmp_path):
+    import threading
+    from main_supres import ticker_database
+
+    (tmp_path / 'kospi.csv').write_text("code,name\n005930,삼성전자\n")
+    path = str(tmp_path / 'built.ddb')
+    ticker_database.build_database([str(tmp_path / 'kospi.csv')], path)
+    database_url = f"duckdb:///{path}"
+    stop, errors, names = threading.Event(), [], set()
+
+    def lookups():
+        s = StockTicker(database_url=database_url, read_only=True)
+        while not stop.is_set():
+            try:
+                names.add(s.execute("SELECT name FROM tickers, range(2000) WHERE code = :code LIMIT 1",
+                                    code='A005930').fetchall()[0][0])
+            except Exception as error:
+                errors.append(error)
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for number in range(5):
+            (tmp_path / 'kospi.csv').write_text(f"code,name\n005930,삼성전자{number}\n")
+            ticker_database.build_database([str(tmp_path / 'kospi.csv')], path)
+            os.utime(path, (0, 1e9 + number))  # A new mtime even on a coarse clock
+            StockTicker(database_url=database_url, read_only=True).get_name('005930')
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    assert errors == []
+    assert StockTicker(database_url=database_url, read_only=True).get_name('005930') == '삼성전자4'
+    assert names  # The lookups ran alongside the rebuilds
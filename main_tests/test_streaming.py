@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_supres import pivots
+from main_supres.streaming import StreamingSupres
+
+
+def klines(file_name):
+    # Binance kline layout: open time, open, high, low, close, volume, oldest first
+    df = pd.read_csv(file_name).iloc[::-1]
+    return df[['unix', 'open', 'high', 'low', 'close', 'Volume USDT']].values.tolist()
+
+
+def batch_lines(window, sens):
+    # Batch path: latest candle repeated once, then sensitivity() and chart_lines()
+    low = np.append(window[:, 3], window[-1, 3])
+    high = np.append(window[:, 2], window[-1, 2])
+    support_list, resistance_list = pivots.sensitivity(low, high, sens)
+    latest_close = window[-1, 4]
+    support_below = sorted(p for _, p in support_list if p < latest_close) or [low.min()]
+    resistance_below = sorted(p for _, p in support_list if p >= latest_close)
+    resistance_above = sorted(p for _, p in resistance_list if p > latest_close) or [high.max()]
+    support_above = sorted(p for _, p in resistance_list if p <= latest_close)
+    return support_list, resistance_list, (support_below, resistance_below, resistance_above, support_above)
+
+
+@pytest.mark.parametrize("sens", [0, 1, 2, 3])
+@pytest.mark.parametrize("candle_count", [60, 254])
+def test_stream_matches_batch(sens, candle_count):
+    rows = klines("BTCUSDT_15m.csv")
+    detector = StreamingSupres(candle_count=candle_count, sens=sens)
+    for count, kline in enumerate(rows, start=1):
+        assert detector.update(kline)
+        window = np.array(rows[max(0, count - candle_count):count], dtype=float)
+        support_list, resistance_list, lines = batch_lines(window, sens)
+        assert detector.support_list == support_list
+        assert detector.resistance_list == resistance_list
+        assert detector.chart_lines() == lines
+
+
+def test_old_klines_are_ignored():
+    rows = klines("BTCUSDT_1d.csv")
+    detector = StreamingSupres.from_klines(rows)
+    support_list = detector.support_list
+    # resending the latest candle or an older one does not move the window
+    assert not detector.update(rows[-1])
+    assert not detector.update(rows[0])
+    assert detector.count == len(rows)
+    assert detector.support_list == support_list
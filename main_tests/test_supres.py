@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from main_supres import pivots, supres
+
+main_supres_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main_supres")
+
+
+def candles(file_name):
+    df = pd.read_csv(file_name, nrows=254).iloc[::-1]
+    df['date'] = pd.to_datetime(df['date'])
+    return pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
+
+
+def pandas_ta_rsi(close, length=14):
+    # pandas_ta.rsi: rma() of gains and losses, rma is ewm(alpha=1/length, min_periods=length)
+    negative = close.diff()
+    positive = negative.copy()
+    positive[positive < 0] = 0
+    negative[negative > 0] = 0
+    positive_avg = positive.ewm(alpha=1 / length, min_periods=length).mean()
+    negative_avg = negative.ewm(alpha=1 / length, min_periods=length).mean()
+    return 100 * positive_avg / (positive_avg + negative_avg.abs())
+
+
+@pytest.mark.parametrize("file_name", ["BTCUSDT_15m.csv", "BTCUSDT_1d.csv"])
+def test_indicators(file_name):
+    close = candles(file_name)['close'][:-1]
+    inds = supres.indicators(close.to_numpy())
+    assert list(inds.keys()) == ['SMA20', 'SMA50', 'SMA100', 'RSI']
+    np.testing.assert_allclose(inds['SMA50'], close.rolling(50).mean(), rtol=1e-10)
+    np.testing.assert_allclose(inds['RSI'], pandas_ta_rsi(close), rtol=1e-10)
+
+
+def test_analyze():
+    df = candles("BTCUSDT_1d.csv")
+    result = supres.analyze(df)
+    support_list, resistance_list = pivots.sensitivity(df['low'], df['high'])
+    latest_close = df['close'].iloc[-1]
+    assert result.support_list == support_list
+    assert result.support_below == [p for _, p in support_list if p < latest_close] or [df['low'].min()]
+    assert result.resistance_above == [p for _, p in resistance_list if p > latest_close] or [df['high'].max()]
+    # is the Fibonacci retracement drawn between the latest support below and resistance above
+    assert result.fibonacci_uptrend[0] == pytest.approx(
+        result.support_below[-1] + (result.resistance_above[-1] - result.support_below[-1]) * 0.236)
+    assert result.float_resistance_above == sorted(result.float_resistance_above)
+    assert result.float_support_below == sorted(result.float_support_below, reverse=True)
+
+
+def test_analyze_picks_from_the_grid():
+    df = candles("BTCUSDT_1d.csv")
+    grid = pivots.sensitivity_grid(df['low'], df['high'])
+    for before_candle_count, sens in [(3, 2), (1, 5), (5, 1)]:
+        result = supres.analyze(df, sens=sens, before_candle_count=before_candle_count, grid=grid)
+        scanned = supres.analyze(df, sens=sens, before_candle_count=before_candle_count)
+        assert result.support_list == scanned.support_list and result.resistance_above == scanned.resistance_above
+
+
+def test_headless_import_time():
+    # Cold start of the headless path: no UI, chart or data source package and well under a second
+    code = ("import sys, time\n"
+            "perf = time.perf_counter()\n"
+            "import supres\n"
+            "print(time.perf_counter() - perf)\n"
+            "print(','.join(m for m in ('streamlit', 'plotly', 'yfinance', 'binance', 'pandas_ta', 'duckdb',"
+            " 'sqlalchemy', 'pandas') if m in sys.modules))\n")
+    output = subprocess.run([sys.executable, "-c", code], cwd=main_supres_dir, capture_output=True, text=True,
+                            check=True).stdout.split("\n")
+    print(f"headless import: {float(output[0]) * 1000:.1f} ms")
+    assert output[1] == ""
+    assert float(output[0]) < 1.0
+
+
+def test_ribbon():
+    close = candles("BTCUSDT_1d.csv")['close'][:-1].reset_index(drop=True)
+    windows = list(range(5, 205, 15))
+    smas = supres.ribbon(close, windows)
+    emas = supres.ribbon(close, windows, kind='ema')
+    assert smas.shape == emas.shape == (len(windows), len(close))
+    for row, window in enumerate(windows):
+        np.testing.assert_allclose(smas[row], close.rolling(window).mean(), rtol=1e-10)
+        seeded = close.copy()
+        seeded.iloc[window - 1] = close.iloc[:window].mean()
+        seeded.iloc[:window - 1] = np.nan
+        np.testing.assert_allclose(emas[row], seeded.ewm(span=window, adjust=False).mean(), rtol=1e-10)
+    assert np.isnan(supres.ribbon(close, [len(close) + 1])).all()
+    assert supres.analyze(candles("BTCUSDT_1d.csv"), ribbon_windows=windows).ribbon.shape == smas.shape
+
+
+def test_level_shapes():
+    shapes, annotations = supres.level_shapes([(10, 1.5), (40, 2.25)], x_end=280, label_x=262, color='red', width=2)
+    assert shapes == [dict(type='line', x0=9, y0=1.5, x1=280, y1=1.5, line=dict(color='red', width=2)),
+                      dict(type='line', x0=39, y0=2.25, x1=280, y1=2.25, line=dict(color='red', width=2))]
+    assert [(a['x'], a['y'], a['text']) for a in annotations] == [(262, 1.5, '1.5'), (262, 2.25, '2.25')]
+    assert supres.level_shapes([], 280, 262, 'red') == ([], [])
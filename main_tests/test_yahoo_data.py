@@ -0,0 +1,86 @@
+import pandas as pd
+
+from main_supres.candle_store import CandleStore
+from main_supres import yahoo_data
+
+day = yahoo_data.day_ms
+
+
+class FakeTicker:
+    """
+    Daily candles on weekdays only, like yfinance history() with a tz-aware index, and a counted info. Prices
+    are days since 2000 times factor, a split changes factor like Yahoo adjusts the whole history.
+    """
+    def __init__(self, end):
+        self.dates = pd.bdate_range(end=end, periods=2000, tz='America/New_York')
+        self.history_calls, self.info_calls, self.factor = [], 0, 1.0
+
+    @property
+    def info(self) -> dict:
+        self.info_calls += 1
+        return {'shortName': 'Fake Inc.', 'longBusinessSummary': 'Makes fakes.'}
+
+    def history(self, start=None, interval='1d', period=None) -> pd.DataFrame:
+        self.history_calls.append(start)
+        dates = self.dates if start is None else self.dates[self.dates.tz_localize(None) >= pd.Timestamp(start)]
+        values = pd.Series((dates.tz_localize(None) - pd.Timestamp('2000-01-01')).days * self.factor, index=dates)
+        return pd.DataFrame({'Open': values, 'High': values + 1, 'Low': values - 1, 'Close': values,
+                             'Volume': 100.0})
+
+
+def test_history_asks_for_a_bounded_span_then_appends(tmp_path):
+    ticker = FakeTicker('2024-06-28')
+    clock = [pd.Timestamp('2024-06-28 20:00').value / 1e9]
+    yahoo = yahoo_data.YahooData(CandleStore(str(tmp_path / 'candles.ddb')), ticker_factory=lambda symbol: ticker,
+                                 clock=lambda: clock[0])
+    df = yahoo.history('FAKE', '1d', candle_count=254)
+    assert len(df) == 254 and df['date'].iloc[-1] == pd.Timestamp('2024-06-28')
+    assert df['date'].iloc[0] > pd.Timestamp('2023-01-01')
+    assert ticker.history_calls[0] > pd.Timestamp('2023-01-01')  # Not the whole history
+
+    ticker.dates = pd.bdate_range(end='2024-07-03', periods=2000, tz='America/New_York')
+    df = yahoo.history('FAKE', '1d', candle_count=254)
+    assert ticker.history_calls[-1] == pd.Timestamp('2024-06-27')  # Only from the last closed stored candle on
+    assert df['date'].iloc[-1] == pd.Timestamp('2024-07-03') and len(df) == 254
+
+
+def test_adjusted_prices_replace_the_stored_span(tmp_path):
+    ticker = FakeTicker('2024-06-28')
+    clock = [pd.Timestamp('2024-06-28 20:00').value / 1e9]
+    yahoo = yahoo_data.YahooData(CandleStore(str(tmp_path / 'candles.ddb')), ticker_factory=lambda symbol: ticker,
+                                 clock=lambda: clock[0])
+    before = yahoo.history('FAKE', '1d', candle_count=254)
+
+    ticker.dates = pd.bdate_range(end='2024-07-03', periods=2000, tz='America/New_York')
+    ticker.factor = 0.5  # A 2:1 split, Yahoo halves every past price
+    clock[0] = pd.Timestamp('2024-07-03 20:00').value / 1e9
+    df = yahoo.history('FAKE', '1d', candle_count=254)
+    assert len(ticker.history_calls) == 3 and ticker.history_calls[-1] < pd.Timestamp('2024-01-01')
+    assert len(df) == 254 and df['date'].iloc[-1] == pd.Timestamp('2024-07-03')
+    days = (df['date'] - pd.Timestamp('2000-01-01')).dt.days
+    assert (df['close'] == days * 0.5).all()  # No seam between the stored and the new candles
+    assert df.set_index('date')['close'].get(before['date'].iloc[-1]) == before['close'].iloc[-1] / 2
+
+
+def test_info_is_kept_for_the_ttl(tmp_path):
+    ticker = FakeTicker('2024-06-28')
+    clock = [1000.0]
+    yahoo = yahoo_data.YahooData(CandleStore(str(tmp_path / 'candles.ddb')), info_ttl=60,
+                                 ticker_factory=lambda symbol: ticker, clock=lambda: clock[0])
+    assert yahoo.info('FAKE')['shortName'] == 'Fake Inc.'
+    assert yahoo.info('FAKE')['longBusinessSummary'] == 'Makes fakes.'
+    assert ticker.info_calls == 1
+    clock[0] += 61
+    yahoo.info('FAKE')
+    assert ticker.info_calls == 2
+
+
+def test_history_start():
+    now = pd.Timestamp('2024-06-28 15:00').value // 1_000_000
+    assert yahoo_data.history_start('1d', 254, now) == pd.Timestamp('2023-06-06')  # 381 + 7 days back
+    assert yahoo_data.history_start('1wk', 10, now) == pd.Timestamp('2024-04-12')
+    assert yahoo_data.history_start('1h', 254, now) == pd.Timestamp('2022-06-30')
+
+
+def test_one_store_per_process():
+    assert yahoo_data.YahooData().store is yahoo_data.YahooData().store
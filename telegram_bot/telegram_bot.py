@@ -1,59 +1,44 @@
-import csv
 import os
 import sys
 import time
 from datetime import datetime
 import pandas as pd
-import pandas_ta.momentum as ta
 import plotly.graph_objects as go
 from binance.client import Client
 import telegram_frameselect
 
+# The pivot engine is shared with main_supres instead of being copied here
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main_supres"))
+import market_data
+import patterns
+import pivots
+from candle_store import CandleStore
+from indicators import indicator_series
+from levels import merged_pivots, tick_size
+
+level_merge_ticks = 0  # Merge levels closer than this many price ticks into one zone, 0 keeps every pivot
+
 
 def historical_data_write():
     """
-    This function writes the historical data to a csv file
+    This function downloads the candles after the last stored one into the local candle store and reads the
+    latest ones back, or downloads them without the store while another process holds it
     """
-    data = ticker + ".csv"
-    candlesticks = client.get_historical_klines(ticker, time_frame, start, limit=270)
-    header_list = ['unix', 'open', 'high', 'low', 'close', 'volume', 'close time', 'Volume USDT', 'tradecount',
-                   'taker buy vol', 'taker buy quote vol', 'ignore']
-    csv_file_write = open(f"../telegram_bot/{data}", "w", newline='')
-    klines_writer = csv.writer(csv_file_write, delimiter=",")
-    # Writing the data to a CSV file.
-    for candles in candlesticks:
-        klines_writer.writerow(candles)
-    csv_file_write.close()
-    df = pd.read_csv(data)
-    df = df.iloc[::-1]
-    df.to_csv(data, header=header_list, index=False)
-    df = pd.read_csv(data)
-    date = pd.to_datetime(df['unix'], unit='ms')
-    df.insert(1, 'date', date)
-    del df['Volume USDT'], df['volume'], df['close time'], df['taker buy vol'], df['taker buy quote vol'], \
-        df['ignore'], df['tradecount']
-    df.dropna(inplace=True)
-    df.to_csv(data, index=False)
+    return store.candles(client, ticker, time_frame, candle_count=254)
 
 
 def main():
     print(f"Start main function in {time.perf_counter() - perf} seconds\n"
-          f"{file_name} data analysis in progress.")
+          f"{ticker} {time_frame} data analysis in progress.")
     candle_count = 254  # Number of candlesticks
-    df = pd.read_csv(file_name, delimiter=',', encoding="utf-8-sig", index_col=False, nrows=candle_count,
-                     keep_default_na=False)
-    df = df.iloc[::-1]
+    df = candles.tail(candle_count).reset_index(drop=True)
     last_candle_close = df['close'][:-1]
-    df['date'] = pd.to_datetime(df['date'], format="%Y-%m-%d")
-    df.reset_index(drop=True, inplace=True)
     df = pd.concat([df, df.tail(1)], axis=0, ignore_index=True)
-    dfsma = df[:-1]
-    sma10 = tuple((dfsma.ta.sma(10)))
-    sma50 = tuple((dfsma.ta.sma(50)))
-    sma100 = tuple((dfsma.ta.sma(100)))
-    rsi = tuple((ta.rsi(last_candle_close)))
-    macd = ta.macd(close=last_candle_close, fast=12, slow=26, signal=9)
-    support_list, resistance_list, fibonacci_uptrend, fibonacci_downtrend, pattern_list = [], [], [], [], []
+    smas = indicator_series(df['close'][:-1], sma_windows=(10, 50, 100))
+    sma10, sma50, sma100 = tuple(smas['SMA10']), tuple(smas['SMA50']), tuple(smas['SMA100'])
+    inds = indicator_series(last_candle_close, sma_windows=())
+    rsi, macd_histogram = tuple(inds['RSI']), inds['MACDh']
+    fibonacci_uptrend, fibonacci_downtrend, pattern_list = [], [], []
     fibonacci_multipliers = (0.236, 0.382, 0.500, 0.618, 0.705, 0.786, 0.886, 1.13)
     support_above, resistance_below, support_below, resistance_above, fig, x_date = [], [], [], [], [], ''
     historical_lowtimeframe = (Client.KLINE_INTERVAL_1MINUTE,
@@ -78,48 +63,6 @@ def main():
                              font=dict(color="black", size=100), xref="paper", yref="paper", x=0.5, y=0.5,
                              showarrow=False))
 
-    def support(candle_value, candle_index, before_candle_count, after_candle_count):
-        """
-        If the price of the asset is increasing for the last before_candle_count and decreasing for
-        the last after_candle_count, then return True. Otherwise, return False
-        :param candle_value: The price data for the asset
-        :param candle_index: The index of the first bar in the support
-        :param before_candle_count: The number of bars back you want to look
-        :param after_candle_count: The number of bars in the second trend
-        :return: True if the price of the price is supported by the previous low price, False if it is not
-        """
-        try:
-            for current_value in range(candle_index - before_candle_count + 1, candle_index + 1):
-                if candle_value.low[current_value] > candle_value.low[current_value - 1]:
-                    return False
-            for current_value in range(candle_index + 1, candle_index + after_candle_count + 1):
-                if candle_value.low[current_value] < candle_value.low[current_value - 1]:
-                    return False
-            return True
-        except KeyError:
-            pass
-
-    def resistance(candle_value, candle_index, before_candle_count, after_candle_count):
-        """
-            If the price of the stock is increasing for the last before_candle_count and decreasing for the last
-            after_candle_count, then return True. Otherwise, return False
-        :param candle_value: The price data for the asset
-            :param candle_index: The index of the first candlestick in the resistance
-            :param before_candle_count: The number of candlesticks back you want to analyze
-            :param after_candle_count: The number of candlesticks after the can
-            :return: True if the price has been increasing for the last n1 periods and decreasing for the n2 periods
-        """
-        try:
-            for current_value in range(candle_index - before_candle_count + 1, candle_index + 1):
-                if candle_value.high[current_value] < candle_value.high[current_value - 1]:
-                    return False
-            for current_value in range(candle_index + 1, candle_index + after_candle_count + 1):
-                if candle_value.high[current_value] > candle_value.high[current_value - 1]:
-                    return False
-                return True
-        except KeyError:
-            pass
-
     def fibonacci_pricelevels(high_price, low_price):
         """
         Uptrend Fibonacci Retracement Formula =>
@@ -135,49 +78,11 @@ def main():
 
     def candlestick_patterns():
         """
-        Takes in a dataframe and returns a list of candlestick patterns found in the dataframe
+        Adds the candlestick patterns found between the 3rd and the 29th latest candles to pattern_list,
+        newest first, each as the pattern followed by its date
         """
-        from candlestick import candlestick
-        nonlocal df
-        df = candlestick.inverted_hammer(df, target='inverted_hammer')
-        df = candlestick.hammer(df, target='hammer')
-        df = candlestick.doji(df, target='doji')
-        df = candlestick.bearish_harami(df, target='bearish_harami')
-        df = candlestick.bearish_engulfing(df, target='bearish_engulfing')
-        df = candlestick.bullish_harami(df, target='bullish_harami')
-        df = candlestick.bullish_engulfing(df, target='bullish_engulfing')
-        df = candlestick.dark_cloud_cover(df, target='dark_cloud_cover')
-        df = candlestick.dragonfly_doji(df, target='dragonfly_doji')
-        df = candlestick.hanging_man(df, target='hanging_man')
-        df = candlestick.gravestone_doji(df, target='gravestone_doji')
-        df = candlestick.morning_star(df, target='morning_star')
-        df = candlestick.morning_star_doji(df, target='morning_star_doji')
-        df = candlestick.piercing_pattern(df, target='piercing_pattern')
-        df = candlestick.star(df, target='star')
-        df = candlestick.shooting_star(df, target='shooting_star')
-        df.replace({True: 'pattern_found'}, inplace=True)  # Dodge boolean 'True' output
-
-        def pattern_find_func(pattern_row, t=0, pattern_find=None):
-            """
-            The function takes in a dataframe and a list of column names. It then iterates through the
-            list of column names and checks if the column name is in the dataframe. If it is, it adds
-            the column name to a list and adds the date of the match to another list
-            """
-            if pattern_find is None:
-                pattern_find = []
-            for col in df.columns:
-                pattern_find.append(col)
-                for pattern in pattern_row:
-                    if pattern == 'pattern_found':
-                        # even pattern, odd date
-                        pattern_list.append(pattern_find[t])
-                        pattern_list.append(pattern_row['date'].strftime('%b-%d-%y'))
-                    t += 1
-
-        for item in range(-3, -30, -1):
-            pattern_find_func(df.iloc[item])
-
-
+        for pattern, date in patterns.find_patterns(df['open'], df['high'], df['low'], df['close'], df['date']):
+            pattern_list.extend([pattern, date.strftime('%b-%d-%y')])
 
     if time_frame in historical_hightimeframe:
         candlestick_patterns()
@@ -194,20 +99,12 @@ def main():
                                     close=df['close'])])
     fig.update_layout(annotations=[watermark_layout])
 
-    def sensitivity(sens):
-        """
-        Find the support and resistance levels for a given asset
-        sensitivity:1 is recommended for daily charts or high frequency trade scalping 
-        :param sens: sensitivity parameter default:2, level of detail 1-2-3 can be given to function
-        """
-        for sens_row in range(3, len(df) - 1):
-            if support(df, sens_row, 3, sens):
-                support_list.append((sens_row, df.low[sens_row]))
-            if resistance(df, sens_row, 3, sens):
-                resistance_list.append((sens_row, df.high[sens_row]))
-        return support_list, resistance_list
-
-    sensitivity(2)
+    support_list, resistance_list = pivots.sensitivity(df['low'].to_numpy(), df['high'].to_numpy(), 2)
+    if level_merge_ticks and tick_size(symbol_info):
+        support_list = merged_pivots(support_list, tick_size=tick_size(symbol_info), ticks=level_merge_ticks,
+                                     candle_count=len(df))
+        resistance_list = merged_pivots(resistance_list, tick_size=tick_size(symbol_info), ticks=level_merge_ticks,
+                                        candle_count=len(df))
 
     def check_lines():
         """
@@ -334,7 +231,7 @@ def main():
         y=[support_list[0]], name=f"RSI         "
                                   f": {int(rsi[-1])}", mode="lines", marker=dict(color=legend_color, size=10)))
     fig.add_trace(go.Scatter(
-        y=[support_list[0]], name=f"MACD      : {int(macd['MACDh_12_26_9'][1]):.{str_price_len}f}", mode="lines",
+        y=[support_list[0]], name=f"MACD      : {int(macd_histogram[-1]):.{str_price_len}f}", mode="lines",
         marker=dict(color=legend_color, size=10)))
 
     # Adding the SMA10, SMA50, and SMA100 to the chart and legend.
@@ -433,25 +330,17 @@ def main():
 
 if __name__ == "__main__":
     os.chdir("../telegram_bot")  # Changing the directory to the `telegram_bot` folder
-    client = Client("", "")
+    client = market_data.binance_client()
     current = datetime.now()
     current_time = current.strftime("%b-%d-%y %H:%M")
     ticker = sys.argv[1]  # Pair
     frame_s = sys.argv[2]  # Timeframe
     # Selecting the time frame for the data to be retrieved.
     time_frame = telegram_frameselect.frame_select(frame_s)[0]
-    # Selecting the frame that the user wants to start from.
-    start = telegram_frameselect.frame_select(frame_s)[1]
     perf = time.perf_counter()
-    historical_data_write()
-    file_name = ticker + ".csv"
+    store = CandleStore()
+    print("Data writing:", ticker, time_frame)
+    candles = historical_data_write()
     # Getting the information about the asset from the Binance API.
     symbol_info = client.get_symbol_info(ticker)
-    print("Data writing:", file_name)
-    if os.path.isfile(file_name):
-        print(f"{file_name} downloaded and created.")
-    else:
-        print(
-            "One or more issues caused the download to fail. "
-            "Make sure you typed the filename correctly in the settings.")
     main()